@@ -1,19 +1,52 @@
+import os
 import sys
-from eh.cli import Eh
 
+from eh import completion
+from eh import constants
 
-def completion_hook(cmd, curr_word, prev_word):
-    eh_obj = Eh(False, True)
-    eh_keys = list(eh_obj.subjects.keys()) + list(eh_obj.repo_subs.subjects)
-    eh_keys.sort()
-    matches = [k for k in eh_keys if k.startswith(curr_word)]
-    return matches
+OPTIONS_WITH_VALUES = ['--repo', '--min_score', '--search_score', '--limit']
+
+
+def completion_hook(cmd, curr_word, prev_word, line=None):
+    """
+    Returns the completions of curr_word for bash.
+
+    line is the command line up to the cursor. The subject words before
+    curr_word are joined into the parent key being completed, the way eh
+    joins them, so both `eh git/re` and `eh git re` complete to rebase.
+    Only one level of the key is completed at a time.
+    """
+    if curr_word.startswith('-') or prev_word in OPTIONS_WITH_VALUES:
+        return []
+    words = (line or constants.EMPTY).split()[1:]
+    if curr_word and words and words[-1] == curr_word:
+        words = words[:-1]
+    subject = []
+    for i, w in enumerate(words):
+        if w.startswith('-'):
+            continue
+        if i > 0 and words[i - 1] in OPTIONS_WITH_VALUES:
+            continue
+        subject.append(w)
+    parent = constants.KEY_DIVIDE_CHAR.join(subject)
+    if parent:
+        parent += constants.KEY_DIVIDE_CHAR
+    prefix = parent + curr_word
+    depth = prefix.count(constants.KEY_DIVIDE_CHAR)
+    trie = completion.CompletionTrie.load()
+    return [
+        k[len(parent):] for k in trie.complete(prefix)
+        if k.count(constants.KEY_DIVIDE_CHAR) == depth]
 
 
 def main():
-    results = completion_hook(*sys.argv[1:])
+    line = os.environ.get('COMP_LINE')
+    if line is not None and 'COMP_POINT' in os.environ:
+        line = line[:int(os.environ['COMP_POINT'])]
+    args = (sys.argv[1:] + [constants.EMPTY] * 3)[:3]
+    results = completion_hook(*args, line=line)
     if len(results):
-          print("\n".join(results))
+        print("\n".join(results))
 
 
 if __name__ == "__main__":
@@ -12,15 +12,13 @@
 # implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import os
+import click
 
-import click 
-import ConfigObject as conf
-
-from eh import config
+from eh import commands
 from eh import constants
-from eh import git_store as gs
-from eh import output
+from eh import daemon
+from eh import pager as eh_pager
+from eh import render_cache
 from eh import topic_manager as tm
 
 
@@ -45,16 +43,57 @@ command_settings = {
 @click.option(
     '--update', is_flag=True, default=False,
     help='Update all repos, or those given with --repo option')
+@click.option(
+    '--build', is_flag=True, default=False,
+    help='Render all topics ahead of time, after updating with --update')
 @click.option(
     '--min_score', default=50,
     help="Minimum match score (0 - 100) to consider matching: defaults to 50")
 @click.option(
     '--search_score', default=35,
     help="Minimum search score (0 - 100) to show in list: defaults to 35")
+@click.option(
+    '--limit', default=constants.DEFAULT_SEARCH_LIMIT,
+    help="Maximum number of search results to show (0 for all): defaults "
+         "to %d" % constants.DEFAULT_SEARCH_LIMIT)
+@click.option(
+    '--full-text', is_flag=True, default=False,
+    help='Search the text of every topic instead of its key and summary')
+@click.option(
+    '--pager', is_flag=True, default=False,
+    help='Show the output in a pager ($PAGER, or less) as it is produced')
+@click.option(
+    '--truncate', is_flag=True, default=False,
+    help='Cut summaries in lists to fit the width of the terminal')
+@click.option(
+    '--format', 'output_format', type=click.Choice(constants.FORMATS),
+    default=constants.FORMAT_TEXT,
+    help='Write results as text or as lines of JSON: defaults to text')
+@click.option(
+    '--with-text', is_flag=True, default=False,
+    help='Add the path and text of topics to JSON results')
+@click.option(
+    '--batch', is_flag=True, default=False,
+    help='Look up a subject from each line of stdin, answering each with '
+         'a line of JSON')
+@click.option(
+    '--explain', is_flag=True, default=False,
+    help='Show how the results were scored and where the time went')
+@click.option(
+    '--timings-json', is_flag=True, default=False,
+    help='Write the time taken by each phase to stderr as JSON')
+@click.option(
+    '--serve', is_flag=True, default=False,
+    help='Run the eh daemon that answers other eh commands from memory')
+@click.option(
+    '--no-daemon', is_flag=True, default=False,
+    help='Do not use the eh daemon even if it is running')
 @click.pass_context
 def main(
-        context, subject, debug, no_colors, repo,
-        dolist, update, min_score, search_score):
+        context, subject, debug, no_colors, repo, dolist, update, build,
+        min_score, search_score, limit, full_text, pager, truncate,
+        output_format, with_text, batch, explain, timings_json, serve,
+        no_daemon):
     """
     Eh is a terminal program that will provide you with
     quick reminders about a subject.
@@ -71,41 +110,61 @@ def main(
     where it will store downloaded subjects.
     """
 
-    repo_list = [str(x) for x in list(repo)]
-    do_list = dolist
-    do_update = update
-
-    conf = config.open_config()
-    if config.is_true(conf.eh.show_default):
-        conf[constants.CONF_TOPIC_STORE][
-            'eh_default'] = constants.DEFAULT_STORE
-
-    topic_key = constants.KEY_DIVIDE_CHAR.join(subject)
-    manager = tm.TopicManager(conf, repo_list, search_score)
-    out = output.MarkdownOutput(conf)
-
-    if do_list:
-        topics = manager.get_all_topics()
-        topics.sort(key=lambda x: str(x[1].key))
-        click.echo(out.output_list(topics))
-    elif do_update:
-        manager.update()
-    else:
-        meta_results = manager.meta_search(topic_key)
-        if len(meta_results) == 0:
-            click.echo("Did not find anything matching that")
-        elif len(meta_results) == 1 and meta_results[0][0] >= min_score:
-            topic = meta_results[0][2]
-            click.echo(out.output_topic(topic))
-        elif len(meta_results) == 1 and meta_results[0][0] < min_score:
-            topic = meta_results[0][2]
-            click.echo("Did you mean to look up %s?" % topic.shortkey)
-            click.echo("The summary of it is: %s" % topic.summary)
-        elif(
-                len(meta_results) > 1 and
-                meta_results[0][0] - meta_results[1][0] > 20):
-            topic = meta_results[0][2]
-            click.echo(out.output_topic(topic))
+    options = commands.make_options(
+        subject, repo, no_colors, dolist, min_score, search_score, limit,
+        full_text, explain,
+        render_cache.terminal_columns() if truncate else None,
+        constants.FORMAT_JSON if batch else output_format, with_text,
+        cols=render_cache.terminal_columns())
+
+    if serve:
+        daemon.EhDaemon().serve()
+        return
+
+    if update or build:
+        conf = commands.open_config()
+        manager = tm.TopicManager(
+            conf, options['repos'], search_score, initialize=not update)
+        if update:
+            commands.update(conf, manager, click.echo)
+        if build:
+            commands.build(conf, manager, click.echo)
+        daemon.send_reload()
+        return
+
+    echo = click.echo
+    if pager:
+        out = eh_pager.Pager()
+        echo = out.echo
+    try:
+        if batch:
+            _batch(options, search_score, timings_json, echo)
         else:
-            click.echo("I found things like that: ")
-            click.echo(out.output_meta(meta_results))
+            _lookup(options, search_score, no_daemon, timings_json, echo)
+    finally:
+        if pager:
+            out.close()
+
+
+def _lookup(options, search_score, no_daemon, timings_json, echo):
+    if not (no_daemon or options['explain'] or timings_json):
+        response = daemon.send_command(options)
+        if response is not None:
+            echo(response)
+            return
+
+    conf = commands.open_config()
+    if not commands.run_exact(conf, options, echo):
+        manager = tm.TopicManager(conf, options['repos'], search_score)
+        manager.write_completion()
+        commands.run(conf, manager, options, echo)
+    commands.report_timings(conf, options, timings_json, echo)
+
+
+def _batch(options, search_score, timings_json, echo):
+    conf = commands.open_config()
+    manager = tm.TopicManager(conf, options['repos'], search_score)
+    manager.write_completion()
+    commands.run_batch(
+        conf, manager, options, click.get_text_stream('stdin'), echo)
+    commands.report_timings(conf, options, timings_json, echo)
@@ -0,0 +1,278 @@
+import sys
+
+from eh import config
+from eh import constants
+from eh import output
+from eh import render_cache
+from eh import render_pack
+from eh import timing
+from eh import topic_manager as tm
+
+
+def open_config():
+    with timing.phase('config'):
+        conf = config.open_config()
+    if config.is_true(conf.eh.show_default):
+        conf[constants.CONF_TOPIC_STORE][
+            'eh_default'] = constants.DEFAULT_STORE
+    return conf
+
+
+def make_options(
+        subject, repos, no_colors, do_list, min_score, search_score,
+        limit=constants.DEFAULT_SEARCH_LIMIT, full_text=False, explain=False,
+        width=None, output_format=constants.FORMAT_TEXT, with_text=False,
+        cols=None):
+    """
+    Returns the options of a single eh command as a plain dict so that it can
+    be run in process or sent to the eh daemon. Tables are cut to width
+    columns when it is given. Topics are rendered for a terminal cols wide,
+    or the one eh runs in if it is None.
+    """
+    return {
+        'subject': [str(s) for s in subject],
+        'repos': [str(r) for r in repos],
+        'no_colors': bool(no_colors),
+        'list': bool(do_list),
+        'min_score': min_score,
+        'search_score': search_score,
+        'limit': limit,
+        'full_text': bool(full_text),
+        'explain': bool(explain),
+        'width': width,
+        'format': output_format,
+        'with_text': bool(with_text),
+        'cols': cols,
+    }
+
+
+def update(conf, manager, echo):
+    """
+    Update the stores of manager and report how each of them went.
+    """
+    results = manager.update()
+    manager.write_completion()
+    if results:
+        echo(output.Output(conf).output_update(results))
+
+
+def build(conf, manager, echo):
+    """
+    Render every topic of the stores of manager ahead of time, on a pool of
+    `workers` processes, into the render pack of each store. Only topics
+    whose text changed since the last build are rendered again.
+    """
+    import concurrent.futures
+    cols = render_cache.terminal_columns()
+    theme = render_cache.theme()
+    workers = config.get_int_option(
+        conf, constants.CONF_EH, constants.CONF_WORKERS,
+        constants.DEFAULT_WORKERS)
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max(1, workers)) as pool:
+        for s in manager.topic_stores:
+            rendered, reused = render_pack.build(s, cols, theme, pool)
+            results.append((s.name, s.topic_count(), rendered, reused))
+    echo(output.Output(conf).output_build(results))
+
+
+def run_exact(conf, options, echo):
+    """
+    Show the topic if the subject of options is the exact key of a topic,
+    without loading any topic store. Returns False if nothing was shown and
+    the stores have to be searched with run.
+    """
+    if (
+            options['list'] or options.get('full_text') or
+            options.get('explain') or
+            options.get('format') == constants.FORMAT_JSON or
+            not options['subject'] or
+            options['min_score'] > constants.MATCH):
+        return False
+    topic_key = constants.KEY_DIVIDE_CHAR.join(options['subject'])
+    with timing.phase('search'):
+        topic = tm.TopicManager.find_exact_topic(
+            conf, options['repos'], topic_key)
+    if topic is None:
+        return False
+    out = output.MarkdownOutput(conf)
+    out.no_colors = options['no_colors']
+    out.cols = options.get('cols')
+    with timing.phase('render'):
+        show_topic(out, topic, echo)
+    return True
+
+
+def show_topic(out, topic, echo):
+    """
+    Hand the rendered topic to echo one block at a time as it is rendered.
+    """
+    for block in out.stream_topic(topic):
+        echo(block)
+
+
+def pick_result(meta_results, min_score):
+    """
+    Returns the result to show the topic of: the only result if it scores at
+    least min_score, or the best one if it is well ahead of the next. Returns
+    None when the results should be listed instead.
+    """
+    if len(meta_results) == 1 and meta_results[0][0] >= min_score:
+        return meta_results[0]
+    if (
+            len(meta_results) > 1 and
+            meta_results[0][0] - meta_results[1][0] > 20):
+        return meta_results[0]
+    return None
+
+
+def run(conf, manager, options, echo):
+    """
+    Run the list or lookup command described by options against manager and
+    hand every message to echo.
+    """
+    out = output.MarkdownOutput(conf)
+    out.no_colors = options['no_colors']
+    out.cols = options.get('cols')
+    out.width = options.get('width')
+    out.with_text = options.get('with_text', False)
+    min_score = options['min_score']
+
+    if options.get('format') == constants.FORMAT_JSON:
+        run_json(out, manager, options, echo)
+        return
+
+    if options['list']:
+        with timing.phase('render'):
+            topics = manager.get_all_topics()
+            topics.sort(key=lambda x: str(x[1].key))
+            echo(out.output_list(topics))
+        return
+
+    limit = options.get('limit') or None
+    if options.get('full_text'):
+        run_full_text(out, manager, options, limit, echo)
+        return
+
+    topic_key = constants.KEY_DIVIDE_CHAR.join(options['subject'])
+    with timing.phase('search'):
+        meta_results = manager.meta_search(
+            topic_key, None if limit is None else max(limit, 2))
+    with timing.phase('render'):
+        picked = pick_result(meta_results, min_score)
+        if len(meta_results) == 0:
+            echo("Did not find anything matching that")
+        elif picked is not None:
+            show_topic(out, picked[2], echo)
+        elif len(meta_results) == 1:
+            topic = meta_results[0][2]
+            echo("Did you mean to look up %s?" % topic.shortkey)
+            echo("The summary of it is: %s" % topic.summary)
+        else:
+            echo("I found things like that: ")
+            echo(out.output_meta(meta_results[:limit]))
+    if options.get('explain') and meta_results:
+        echo("How the results were scored: ")
+        echo(out.output_explain(topic_key, meta_results[:limit]))
+
+
+def run_json(out, manager, options, echo):
+    """
+    Same as run but every message is a line of JSON: a line for each topic
+    when listing, otherwise a single line with the results of the lookup
+    (see lookup_record).
+    """
+    if options['list']:
+        with timing.phase('render'):
+            topics = manager.get_all_topics()
+            topics.sort(key=lambda x: str(x[1].key))
+            if not topics:
+                return
+            echo(constants.CR_CHAR.join(
+                out.output_json(out.topic_record(None, repo, t))
+                for repo, t in topics))
+        return
+    echo(out.output_json(lookup_record(out, manager, options)))
+
+
+def lookup_record(out, manager, options):
+    """
+    Returns the results of looking up the subject of options as a dict:
+
+        {"subject": "git/commit", "topic": {...}, "results": [{...}, ...]}
+
+    topic is the result eh would show the topic of, or None if it would list
+    the results instead. Full text searches never pick a topic.
+    """
+    limit = options.get('limit') or None
+    if options.get('full_text'):
+        subject = ' '.join(options['subject'])
+        with timing.phase('search'):
+            results = [
+                (round(score, 2), name, t) for score, name, t in
+                manager.full_text_search(subject, limit)]
+        picked = None
+    else:
+        subject = constants.KEY_DIVIDE_CHAR.join(options['subject'])
+        with timing.phase('search'):
+            results = manager.meta_search(
+                subject, None if limit is None else max(limit, 2))
+        picked = pick_result(results, options['min_score'])
+    lookup = subject if options.get('explain') else None
+    with timing.phase('render'):
+        return {
+            'subject': subject,
+            'topic': (
+                None if picked is None else
+                out.topic_record(picked[0], picked[1], picked[2], lookup)),
+            'results': [
+                out.topic_record(score, name, t, lookup)
+                for score, name, t in results[:limit]],
+        }
+
+
+def run_batch(conf, manager, options, lines, echo):
+    """
+    Look up the subject on each of lines, its words separated by spaces like
+    on the command line, and answer each with a line of JSON as made by
+    lookup_record. Empty lines are skipped.
+    """
+    out = output.MarkdownOutput(conf)
+    out.with_text = options.get('with_text', False)
+    for line in lines:
+        subject = line.split()
+        if not subject:
+            continue
+        echo(out.output_json(
+            lookup_record(out, manager, dict(options, subject=subject))))
+
+
+def run_full_text(out, manager, options, limit, echo):
+    """
+    Search the text of all topics for the words of the subject and list the
+    best matches.
+    """
+    query = ' '.join(options['subject'])
+    with timing.phase('search'):
+        results = manager.full_text_search(query, limit)
+    with timing.phase('render'):
+        if not results:
+            echo("Did not find anything matching that")
+            return
+        echo("I found things like that: ")
+        echo(out.output_meta(
+            [(round(score, 2), name, t) for score, name, t in results]))
+
+
+def report_timings(conf, options, timings_json, echo):
+    """
+    Show how long each phase of the command took, as a table when explaining
+    and as a single line of JSON on stderr when asked to.
+    """
+    if (
+            options.get('explain') and
+            options.get('format') != constants.FORMAT_JSON):
+        echo("Where the time went: ")
+        echo(output.Output(conf).output_timings(timing.TIMINGS))
+    if timings_json:
+        sys.stderr.write(timing.TIMINGS.to_json() + constants.CR_CHAR)
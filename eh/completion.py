@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+
+from eh import constants
+
+
+class CompletionTrie(object):
+    """
+    The CompletionTrie class is a prefix trie of every topic key and parent
+    path, used by eh_autocomplete to complete subjects without loading any
+    topic store.
+
+    Chains of nodes with a single child are merged into one edge, so every
+    node is a [terminal, edges] pair where edges maps a label of one or more
+    characters to the next node:
+
+        "git/re" -> [0, {"base": [1, {}], "set": [1, {}]}]
+
+    The trie is written to constants.COMPLETION_FILE whenever the topics
+    change, as a line holding a digest of the entries followed by a line of
+    JSON. Reading it only takes a json.loads; nothing else of eh is needed.
+    """
+    def __init__(self, root=None):
+        self.root = root if root is not None else [0, {}]
+
+    def add(self, word):
+        node = self.root
+        while word:
+            edges = node[1]
+            for label in list(edges):
+                common = CompletionTrie._common_prefix(label, word)
+                if not common:
+                    continue
+                if common != label:
+                    split = [0, {label[len(common):]: edges.pop(label)}]
+                    edges[common] = split
+                node = edges[common]
+                word = word[len(common):]
+                break
+            else:
+                edges[word] = [0, {}]
+                node = edges[word]
+                word = constants.EMPTY
+        node[0] = 1
+
+    @staticmethod
+    def _common_prefix(a, b):
+        i = 0
+        while i < len(a) and i < len(b) and a[i] == b[i]:
+            i += 1
+        return a[:i]
+
+    def complete(self, prefix):
+        """
+        Returns every word in the trie starting with prefix, sorted.
+        """
+        node = self.root
+        found = constants.EMPTY
+        rest = prefix
+        while rest:
+            for label, child in node[1].items():
+                if rest.startswith(label):
+                    node = child
+                    found += label
+                    rest = rest[len(label):]
+                    break
+                if label.startswith(rest):
+                    node = child
+                    found += label
+                    rest = constants.EMPTY
+                    break
+            else:
+                return []
+        out = []
+        pending = [(found, node)]
+        while pending:
+            word, node = pending.pop()
+            if node[0]:
+                out.append(word)
+            for label, child in node[1].items():
+                pending.append((word + label, child))
+        return sorted(out)
+
+    @staticmethod
+    def digest(words):
+        return hashlib.sha1(
+            constants.CR_CHAR.join(words).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def write(words, path=None):
+        """
+        Write a trie of words to path unless the trie there already holds
+        exactly these words.
+        """
+        path = path or constants.COMPLETION_FILE
+        words = sorted(set(words))
+        digest = CompletionTrie.digest(words)
+        try:
+            with open(path, 'r') as trie_file:
+                if trie_file.readline().strip() == digest:
+                    return
+        except (IOError, OSError):
+            pass
+        trie = CompletionTrie()
+        for word in words:
+            trie.add(word)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(tmp_path, 'w') as trie_file:
+                trie_file.write(digest + constants.CR_CHAR)
+                json.dump(trie.root, trie_file, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def load(path=None):
+        """
+        Returns the trie written to path, or an empty trie if there is none.
+        """
+        path = path or constants.COMPLETION_FILE
+        try:
+            with open(path, 'r') as trie_file:
+                trie_file.readline()
+                return CompletionTrie(json.loads(trie_file.readline()))
+        except (IOError, OSError, ValueError):
+            return CompletionTrie()
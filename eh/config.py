@@ -10,6 +10,27 @@ def is_true(value):
     return value.upper() in ['TRUE', 'T', 'YES']
 
 
+def get_option(conf, section, option, default=None):
+    """
+    Returns the value of option in section or default if either is missing.
+    """
+    if not conf or section not in conf:
+        return default
+    if option not in conf[section]:
+        return default
+    return conf[section][option]
+
+
+def get_int_option(conf, section, option, default):
+    """
+    Same as get_option but returns an int, or default if the value is not one.
+    """
+    try:
+        return int(get_option(conf, section, option, default))
+    except (TypeError, ValueError):
+        return default
+
+
 def open_config():
     if not os.path.exists(constants.CONF_DIR):
         os.mkdir(constants.CONF_DIR)
@@ -5,13 +5,53 @@ META_START_CHAR = '('
 META_END_CHAR = ')'
 META_DIVIDE_CHAR = ','
 CR_CHAR = '\n'
+FRONT_MATTER_CHAR = '---'
 KNOWN_EXT = ['.md']
+IGNORED_DIRS = ['.git', '.hg', '.svn', 'node_modules', '__pycache__']
 KEY_DIVIDE_CHAR = os.sep
 EMPTY = ''
 CONF_TOPIC_STORE = 'topic_stores'
 CONF_TOPIC_KEY = 'topics'
+CONF_LIST_DIVIDE_CHAR = ','
+CONF_EH = 'eh'
+CONF_LAZY_TOPICS = 'lazy_topics'
+CONF_WORKERS = 'workers'
+DEFAULT_WORKERS = 4
+PARALLEL_PARSE_MIN = 16
+CONF_UPDATE_TIMEOUT = 'update_timeout'
+DEFAULT_UPDATE_TIMEOUT = 120
+CONF_SHALLOW_CLONE = 'shallow_clone'
+CONF_QUERY_CACHE_SIZE = 'query_cache_size'
+CONF_FULL_TEXT = 'full_text'
+CONF_RENDER_CACHE_SIZE = 'render_cache_size'
+DEFAULT_RENDER_CACHE_SIZE = 8 * 1024 * 1024
+STREAM_BLOCK_LINES = 40
+DEFAULT_PAGER = 'less'
+DEFAULT_LESS = 'FRX'
+FORMAT_TEXT = 'text'
+FORMAT_JSON = 'json'
+FORMATS = [FORMAT_TEXT, FORMAT_JSON]
+DEFAULT_QUERY_CACHE_SIZE = 128
+CLONE_DEPTH = 1
 CONF_DIR_NAME = '.eh'
 CONF_NAME = 'eh.ini'
+INDEX_DIR_NAME = 'index'
+CACHE_DIR_NAME = 'cache'
+RENDER_DIR_NAME = 'render'
+SOCKET_NAME = 'eh.sock'
+COMPLETION_NAME = 'completion.trie'
+SOCKET_TIMEOUT = 5
+DAEMON_OUTPUT_CACHE_SIZE = 256
+DEFAULT_SEARCH_LIMIT = 20
+INDEX_EXT = '.json'
+RENDER_EXT = '.txt'
+PACK_EXT = '.pack'
+FULLTEXT_SUFFIX = '.fulltext'
+INDEX_VERSION = 1
+QUERY_CACHE_VERSION = 1
+FULLTEXT_VERSION = 1
+RENDER_CACHE_VERSION = 2
+RENDER_PACK_VERSION = 1
 TOPIC_KEY = "_"
 PARENT_KEY = "_parents"
 STR_TOPIC_REPR = "%s %d chars %s %s" 
@@ -22,10 +62,21 @@ PACKAGE_DIR = os.path.join(ROOT_DIR)
 USERHOME = os.path.expanduser('~')
 CONF_DIR = os.path.join(USERHOME, CONF_DIR_NAME)
 CONF_FILE = os.path.join(CONF_DIR, CONF_NAME)
+INDEX_DIR = os.path.join(CONF_DIR, INDEX_DIR_NAME)
+CACHE_DIR = os.path.join(CONF_DIR, CACHE_DIR_NAME)
+RENDER_DIR = os.path.join(CONF_DIR, RENDER_DIR_NAME)
+SOCKET_FILE = os.path.join(CONF_DIR, SOCKET_NAME)
+COMPLETION_FILE = os.path.join(CONF_DIR, COMPLETION_NAME)
 DEFAULT_CONF = os.path.join(PACKAGE_DIR, 'default_conf.ini')
 
 MATCH = 100
 
+UPDATE_CLONED = 'cloned'
+UPDATE_CHANGED = 'changed'
+UPDATE_UNCHANGED = 'unchanged'
+UPDATE_FAILED = 'failed'
+UPDATE_SKIPPED = 'skipped'
+
 SHORTKEY_WEIGHT = 0.5
 KEY_WEIGHT = 0.3
 META_WEIGHT = 0.2
@@ -0,0 +1,185 @@
+import collections
+import json
+import os
+import socket
+
+import click
+
+from eh import commands
+from eh import constants
+from eh import topic_manager as tm
+
+
+class EhDaemon(object):
+    """
+    The EhDaemon keeps loaded topic managers and rendered output in memory and
+    answers eh commands sent over the unix domain socket at
+    constants.SOCKET_FILE.
+
+    Every request and every response is a single line of JSON:
+
+        {"action": "run", "options": {...}}  ->  {"output": "..."}
+        {"action": "reload"}                  ->  {"output": ""}
+        {"action": "ping"}                    ->  {"output": "pong"}
+
+    The options of a run request are the ones made by commands.make_options,
+    including the width of the terminal of the client. Requests are handled
+    one at a time. Everything kept in memory is dropped on a reload request
+    and whenever eh.ini changes. Before every run the stores are checked for
+    changed files; stores that changed are read again and all rendered
+    output is dropped.
+    """
+    def __init__(self, socket_path=None):
+        self.socket_path = socket_path or constants.SOCKET_FILE
+        self.conf = None
+        self._conf_mtime = None
+        self._managers = {}
+        self._outputs = collections.OrderedDict()
+
+    def reload(self):
+        self.conf = None
+        self._conf_mtime = None
+        self._managers = {}
+        self._outputs = collections.OrderedDict()
+
+    def _check_config(self):
+        if (
+                self.conf is None or
+                self._conf_mtime != _mtime(constants.CONF_FILE)):
+            self.reload()
+            self.conf = commands.open_config()
+            self._conf_mtime = _mtime(constants.CONF_FILE)
+
+    def manager(self, options):
+        key = (tuple(options['repos']), options['search_score'])
+        if key not in self._managers:
+            self._managers[key] = tm.TopicManager(
+                self.conf, list(options['repos']), options['search_score'])
+            self._managers[key].write_completion()
+        return self._managers[key]
+
+    def run(self, options):
+        """
+        Returns the output of the command described by options, rendering it
+        only if the same command has not been answered before.
+        """
+        self._check_config()
+        manager = self.manager(options)
+        if manager.refresh():
+            manager.write_completion()
+            self._outputs = collections.OrderedDict()
+        key = json.dumps(options, sort_keys=True)
+        if key in self._outputs:
+            self._outputs.move_to_end(key)
+            return self._outputs[key]
+        lines = []
+        commands.run(
+            self.conf, manager, options,
+            lambda message: lines.append(str(message)))
+        result = constants.CR_CHAR.join(lines)
+        self._outputs[key] = result
+        while len(self._outputs) > constants.DAEMON_OUTPUT_CACHE_SIZE:
+            self._outputs.popitem(last=False)
+        return result
+
+    def handle(self, request):
+        action = request.get('action')
+        try:
+            if action == 'run':
+                return {'output': self.run(request['options'])}
+            if action == 'reload':
+                self.reload()
+                return {'output': constants.EMPTY}
+            if action == 'ping':
+                return {'output': 'pong'}
+        except Exception as e:
+            return {'error': str(e)}
+        return {'error': 'Unknown action: %s' % action}
+
+    def make_server(self):
+        """
+        Returns a unix stream server bound to the socket that hands every
+        request to this daemon.
+        """
+        import socketserver
+
+        eh_daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline().decode('utf-8'))
+                except ValueError:
+                    response = {'error': 'Invalid request'}
+                else:
+                    response = eh_daemon.handle(request)
+                self.wfile.write(
+                    (json.dumps(response) + constants.CR_CHAR).encode('utf-8'))
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = socketserver.UnixStreamServer(self.socket_path, Handler)
+        os.chmod(self.socket_path, 0o600)
+        return server
+
+    def serve(self):
+        """
+        Listen on the socket until interrupted.
+        """
+        if _send({'action': 'ping'}, self.socket_path) is not None:
+            click.echo("The eh daemon is already running")
+            return
+        server = self.make_server()
+        click.echo("eh daemon listening on %s" % self.socket_path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _send(request, socket_path=None):
+    """
+    Send request to the daemon and return its response, or None if the daemon
+    is not running or did not answer.
+    """
+    socket_path = socket_path or constants.SOCKET_FILE
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(constants.SOCKET_TIMEOUT)
+        sock.connect(socket_path)
+        sock.sendall(
+            (json.dumps(request) + constants.CR_CHAR).encode('utf-8'))
+        data = sock.makefile('rb').readline()
+        return json.loads(data.decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+
+
+def send_command(options, socket_path=None):
+    """
+    Returns the output of the command described by options as answered by the
+    daemon, or None if it has to be run in process.
+    """
+    response = _send({'action': 'run', 'options': options}, socket_path)
+    if not response or 'output' not in response:
+        return None
+    return response['output']
+
+
+def send_reload(socket_path=None):
+    _send({'action': 'reload'}, socket_path)
@@ -14,6 +14,10 @@ class TopicInvalidRootPath(EhError):
     pass
 
 
+class GitStoreError(EhError):
+    pass
+
+
 class InvalidValue(EhError):
     pass
 
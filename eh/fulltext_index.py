@@ -0,0 +1,170 @@
+import heapq
+import json
+import math
+import os
+import re
+
+from eh import constants
+
+TOKEN_RE = re.compile(r'\w+(?:[-.]\w+)*')
+
+
+class FullTextIndex(object):
+    """
+    The FullTextIndex class is a persistent inverted index over the text of
+    the topics of a single store, ranked with BM25.
+
+    It is saved next to the TopicIndex of the store, as a line holding the
+    digest of the TopicIndex it was built from followed by a line of JSON:
+
+        docs = {
+            "git/commit.md": {
+                "mtime": 1476000000000000000, "size": 512, "length": 80,
+                "terms": ["amend", "commit", ...]
+            }
+        }
+        postings = {"amend": {"git/commit.md": 2}, ...}
+
+    While the digest matches the index does not even have to be loaded to
+    know it is up to date. Only topics whose mtime or size changed are read
+    again when it is not.
+    """
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, name, filepath):
+        self.name = name
+        self.filepath = filepath
+        self.path = os.path.join(
+            constants.INDEX_DIR,
+            '%s%s%s' % (name, constants.FULLTEXT_SUFFIX, constants.INDEX_EXT))
+        self.docs = {}
+        self.postings = {}
+        self.loaded = False
+
+    @staticmethod
+    def tokenize(text):
+        return TOKEN_RE.findall((text or constants.EMPTY).lower())
+
+    def is_current(self, digest):
+        try:
+            with open(self.path, 'r') as index_file:
+                return index_file.readline().strip() == digest
+        except (IOError, OSError):
+            return False
+
+    def load(self):
+        """
+        Load the index from disk. A missing, unreadable or outdated index
+        simply results in an empty index that will be rebuilt.
+        """
+        self.docs = {}
+        self.postings = {}
+        self.loaded = True
+        try:
+            with open(self.path, 'r') as index_file:
+                index_file.readline()
+                data = json.loads(index_file.readline())
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get('version') != constants.FULLTEXT_VERSION:
+            return
+        if data.get('filepath') != self.filepath:
+            return
+        self.docs = data.get('docs', {})
+        self.postings = data.get('postings', {})
+
+    def save(self, digest):
+        data = {
+            'version': constants.FULLTEXT_VERSION,
+            'filepath': self.filepath,
+            'docs': self.docs,
+            'postings': self.postings,
+        }
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            if not os.path.exists(constants.INDEX_DIR):
+                os.makedirs(constants.INDEX_DIR)
+            with open(tmp_path, 'w') as index_file:
+                index_file.write(digest + constants.CR_CHAR)
+                json.dump(data, index_file, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError):
+            pass
+
+    def remove(self, path):
+        doc = self.docs.pop(path, None)
+        if doc is None:
+            return
+        for term in doc['terms']:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(path, None)
+            if not posting:
+                del self.postings[term]
+
+    def add(self, path, stat, text):
+        self.remove(path)
+        tokens = FullTextIndex.tokenize(text)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[path] = count
+        self.docs[path] = {
+            'mtime': stat[0] if stat else None,
+            'size': stat[1] if stat else None,
+            'length': len(tokens),
+            'terms': sorted(counts),
+        }
+
+    def update(self, topics, stats):
+        """
+        Bring the index up to date with topics. stats maps the path of a
+        topic to its (mtime, size); a topic is only read again if those do
+        not match what was indexed.
+        """
+        paths = set()
+        for t in topics:
+            paths.add(t.path)
+            stat = stats.get(t.path)
+            doc = self.docs.get(t.path)
+            if (
+                    doc is not None and stat is not None and
+                    (doc['mtime'], doc['size']) == tuple(stat)):
+                continue
+            self.add(t.path, stat, t.text)
+        for path in [p for p in self.docs if p not in paths]:
+            self.remove(path)
+
+    def search(self, query, limit=None):
+        """
+        Returns (score, path) for the documents containing any term of
+        query, best first, at most limit of them.
+        """
+        terms = set(FullTextIndex.tokenize(query))
+        count = len(self.docs)
+        if not terms or not count:
+            return []
+        average = float(sum(d['length'] for d in self.docs.values())) / count
+        scores = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(
+                1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for path, tf in posting.items():
+                length = self.docs[path]['length']
+                norm = FullTextIndex.K1 * (
+                    1 - FullTextIndex.B +
+                    FullTextIndex.B * length / (average or 1))
+                scores[path] = scores.get(path, 0) + (
+                    idf * tf * (FullTextIndex.K1 + 1) / (tf + norm))
+        ranked = [(score, path) for path, score in scores.items()]
+        if limit is None:
+            return sorted(ranked, reverse=True)
+        return heapq.nlargest(limit, ranked)
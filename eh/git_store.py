@@ -1,12 +1,30 @@
 import os
-import git
 
 import click
 
+from eh import config
+from eh import constants
+from eh import exceptions as exc
+from eh import timing
 from eh import topic_store as ts
 
 
 class GitTopicStore(ts.TopicStore):
+    """
+    A TopicStore kept in a git repository cloned under the eh directory.
+
+    The index of a git store records the commit it was built from. As long as
+    HEAD has not moved the store is built from the index alone; when it has,
+    only the files changed between the two commits are parsed again.
+
+    Unless shallow_clone is turned off the repository is cloned and updated
+    with a history of depth 1, since eh only reads the working tree. When
+    topics are selected for the store only their files are checked out,
+    using a sparse checkout.
+
+    GitPython is only imported by the methods that need it so that looking
+    up a topic does not pay for importing it.
+    """
     def __init__(self, conf, repo, filepath, name):
         """
         repo - is the git url
@@ -16,37 +34,271 @@ class GitTopicStore(ts.TopicStore):
         self.repo_path = '%s%s' % (filepath, os.sep)
         super(GitTopicStore, self).__init__(
             conf, self.repo_path, name)
+        self.timeout = config.get_int_option(
+            conf, constants.CONF_EH, constants.CONF_UPDATE_TIMEOUT,
+            constants.DEFAULT_UPDATE_TIMEOUT)
+        self.shallow = config.is_true(config.get_option(
+            conf, constants.CONF_EH, constants.CONF_SHALLOW_CLONE, 'true'))
 
     def initialize(self, conf):
         if not self._check_if_directories_exist():
-            self._init_repo()
+            try:
+                self._init_repo()
+            except exc.GitStoreError as e:
+                click.echo(str(e), err=True)
+                return
+        elif self._sparse_patterns() != self._current_sparse_patterns():
+            try:
+                self._apply_sparse_checkout()
+            except exc.GitStoreError as e:
+                click.echo(str(e), err=True)
+        self.index.load()
+        head = self._head_commit()
+        if (
+                head is None or self.index.head is None or
+                self.index.selected != self._selected_topics):
+            self._full_initialize(conf, head)
+            return
+        self.topic_paths = sorted(
+            self.index.entries.keys(), key=ts.TopicStore.walk_order)
+        with timing.phase('parse'):
+            self._topics = self._parse_topics(
+                conf, self.root_node, self.filepath, self.topic_paths,
+                verify=False)
+        if self.index.head != head:
+            import git
+            try:
+                with timing.phase('parse'):
+                    self._reindex_commits(conf, self.index.head, head)
+            except (git.exc.GitError, ValueError):
+                self._reset()
+                self._full_initialize(conf, head)
+                return
+        self.index.save()
+        self.index_full_text()
+
+    def is_current(self, conf):
+        """
+        Returns True if HEAD is still the commit the topics were read from.
+        """
+        return self._head_commit() == self.index.head
+
+    def version_stamp(self):
+        """
+        The commit the topics were read from identifies them, unless it is
+        unknown.
+        """
+        if self.index.head is None:
+            return super(GitTopicStore, self).version_stamp()
+        return '%s %s' % (
+            self.index.head,
+            constants.CONF_LIST_DIVIDE_CHAR.join(self._selected_topics))
+
+    def _full_initialize(self, conf, head):
         super(GitTopicStore, self).initialize(conf)
+        self.index.set_head(head, self._selected_topics)
+        self.index.save()
+
+    def _head_commit(self):
+        """
+        Returns the commit HEAD points at by reading the git metadata
+        directly, or None if it cannot be determined.
+        """
+        git_dir = os.path.join(self.repo_path, '.git')
+        try:
+            with open(os.path.join(git_dir, 'HEAD'), 'r') as head_file:
+                head = head_file.read().strip()
+            if not head.startswith('ref:'):
+                return head or None
+            ref = head[len('ref:'):].strip()
+            ref_path = os.path.join(git_dir, *ref.split('/'))
+            if os.path.exists(ref_path):
+                with open(ref_path, 'r') as ref_file:
+                    return ref_file.read().strip() or None
+            with open(os.path.join(git_dir, 'packed-refs'), 'r') as packed:
+                for line in packed:
+                    parts = line.strip().split(' ')
+                    if len(parts) == 2 and parts[1] == ref:
+                        return parts[0]
+        except (IOError, OSError):
+            pass
+        return None
+
+    def _changed_paths(self, old, new):
+        """
+        Returns (changed, removed) lists of paths that differ between the
+        commits old and new.
+        """
+        import git
+        changed = []
+        removed = []
+        repo = git.Repo(self.repo_path)
+        for diff in repo.commit(old).diff(new):
+            if diff.deleted_file or diff.renamed_file:
+                removed.append(diff.a_path)
+            if not diff.deleted_file:
+                changed.append(diff.b_path)
+        to_local = (lambda p: p.replace('/', constants.KEY_DIVIDE_CHAR))
+        ignored = set(constants.IGNORED_DIRS)
+        return (
+            [to_local(p) for p in changed
+                if not ignored.intersection(p.split('/')[:-1])],
+            [to_local(p) for p in removed])
+
+    def _reindex_commits(self, conf, old, new):
+        """
+        Update the topics, graph and index of this store for the changes
+        between the commits old and new.
+        """
+        changed, removed = self._changed_paths(old, new)
+        self._reindex_paths(conf, changed, removed)
+        self.index.set_head(new, self._selected_topics)
+
+    def _git_env(self):
+        """
+        Environment for git commands talking to the remote: abort transfers
+        that stall for longer than the update timeout.
+        """
+        return {
+            'GIT_HTTP_LOW_SPEED_LIMIT': '1',
+            'GIT_HTTP_LOW_SPEED_TIME': str(self.timeout),
+            'GIT_TERMINAL_PROMPT': '0',
+        }
+
+    def _git_dir(self, *parts):
+        return os.path.join(self.repo_path, '.git', *parts)
+
+    def _sparse_patterns(self):
+        """
+        Returns the sparse checkout patterns matching the files of the
+        selected topics, or an empty list if every topic is wanted.
+        """
+        patterns = []
+        for key in self._selected_topics:
+            path = '/'.join(key.split(constants.KEY_DIVIDE_CHAR))
+            patterns.extend(
+                '/%s%s' % (path, ext) for ext in constants.KNOWN_EXT)
+        return patterns
+
+    def _current_sparse_patterns(self):
+        try:
+            with open(self._git_dir('info', 'sparse-checkout'), 'r') as f:
+                return [line.strip() for line in f if line.strip()]
+        except (IOError, OSError):
+            return []
+
+    def _apply_sparse_checkout(self):
+        """
+        Check out only the files of the selected topics, or every file again
+        if no topics are selected.
+        """
+        import git
+        patterns = self._sparse_patterns()
+        info_dir = self._git_dir('info')
+        if not os.path.exists(info_dir):
+            os.makedirs(info_dir)
+        with open(self._git_dir('info', 'sparse-checkout'), 'w') as f:
+            f.write(constants.CR_CHAR.join(patterns or ['/*']))
+            f.write(constants.CR_CHAR)
+        g = git.cmd.Git(self.repo_path)
+        try:
+            g.config('core.sparseCheckout', 'true')
+            g.read_tree('-mu', 'HEAD')
+            if not patterns:
+                g.config('core.sparseCheckout', 'false')
+                os.remove(self._git_dir('info', 'sparse-checkout'))
+        except git.exc.GitCommandError as e:
+            raise exc.GitStoreError(
+                "Failed to check out: %s" % GitTopicStore._git_error(e))
+
+    def _is_shallow(self):
+        return os.path.exists(self._git_dir('shallow'))
 
     def _setup_repo_directory(self):
+        import git
         if not os.path.exists(self.repo_path):
             os.makedirs(self.repo_path)
-        git.Repo.clone_from(self.repo, self.repo_path)
+        options = {}
+        if self.shallow:
+            options['depth'] = constants.CLONE_DEPTH
+        if self._sparse_patterns():
+            options['no_checkout'] = True
+        git.Repo.clone_from(
+            self.repo, self.repo_path, env=self._git_env(), **options)
+        if self._sparse_patterns():
+            self._apply_sparse_checkout()
 
     def _init_repo(self):
+        import git
         try:
             self._setup_repo_directory()
         except git.exc.GitCommandError as e:
-            click.echo("Failed to clone: %s" % e)
-            exit(1)
+            raise exc.GitStoreError(
+                "Failed to clone: %s" % GitTopicStore._git_error(e))
+
+    @staticmethod
+    def _git_error(error):
+        """
+        Returns the first fatal line git wrote to stderr for a failed command,
+        or the whole error if there is none.
+        """
+        stderr = str(getattr(error, 'stderr', None) or constants.EMPTY)
+        for line in stderr.splitlines():
+            line = line.strip().strip("'").strip()
+            if line.startswith('fatal:'):
+                return line[len('fatal:'):].strip()
+        return str(error).strip()
 
     def _get_subjects_from_repo(self):
         if not self._check_if_directories_exist():
-            click.echo('Need to initialize subjects')
+            click.echo('Need to initialize subjects', err=True)
             self._init_repo()
 
     def _check_if_directories_exist(self):
-        return os.path.exists(self.repo_path)
+        return os.path.exists(os.path.join(self.repo_path, '.git'))
+
+    def is_available(self):
+        return self._check_if_directories_exist()
 
     def update(self):
+        """
+        Clone or pull the repository and return one of the UPDATE_ constants.
+
+        A shallow clone is not pulled, as the history needed to merge is
+        missing: the newest commit is fetched with depth 1 and the working
+        tree is reset to it.
+
+        Raises GitStoreError if git fails or the pull takes longer than the
+        update timeout.
+        """
         if not self._check_if_directories_exist():
-            click.echo('Need to initialize subjects')
             self._init_repo()
-        else:
-            g = git.cmd.Git(self.repo_path)
-            g.pull()
-            click.echo("Updated subjects")
+            return constants.UPDATE_CLONED
+        import git
+        old_head = self._head_commit()
+        g = git.cmd.Git(self.repo_path)
+        g.update_environment(**self._git_env())
+        try:
+            if self._is_shallow():
+                g.fetch(
+                    '--depth=%d' % constants.CLONE_DEPTH,
+                    kill_after_timeout=self.timeout)
+                g.reset('--hard', 'FETCH_HEAD')
+            else:
+                g.pull(kill_after_timeout=self.timeout)
+        except git.exc.GitCommandError as e:
+            raise exc.GitStoreError(
+                "Failed to pull: %s" % GitTopicStore._git_error(e))
+        new_head = self._head_commit()
+        if old_head == new_head:
+            return constants.UPDATE_UNCHANGED
+        if old_head and new_head and self.index.head == old_head:
+            try:
+                self._reindex_commits(self.conf, old_head, new_head)
+            except (git.exc.GitError, ValueError):
+                self._reset()
+                self._full_initialize(self.conf, new_head)
+                return constants.UPDATE_CHANGED
+            self.index.save()
+            self.index_full_text()
+        return constants.UPDATE_CHANGED
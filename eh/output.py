@@ -1,38 +1,34 @@
-import mdv
-
-from prettytable import PrettyTable
-from prettytable import PLAIN_COLUMNS, NONE
+import json
+import os
 
+from eh import config
 from eh import constants
+from eh import render_cache
+from eh import render_pack
+from eh import table
 
 
 class Output(object):
     def __init__(self, conf):
         self.conf = conf
+        self.width = None
+        self.with_text = False
+
+    def _table(self, columns):
+        """
+        Returns an empty table with the given columns, cut to self.width
+        columns if it is set.
+        """
+        return table.Table(columns, self.width)
 
     def _topic_table(self, topics):
-        t = PrettyTable(
-            ['Subject', 'Summary'],
-            padding_width=0,
-            style=PLAIN_COLUMNS,
-            vertical_char=' ', horizontal_char=' ', junction_char=' ',
-            hrules=NONE)
-        t.align['Subject'] = 'l'
-        t.align['Summary'] = 'l'
+        t = self._table(['Subject', 'Summary'])
         for topic in topics:
             t.add_row([topic.key, topic.summary])
         return t
 
     def _parent_table(self, top_level, parents, manager):
-        t = PrettyTable(
-            ['Subtopics', 'Topics', 'Samples'],
-            padding_width=0,
-            style=PLAIN_COLUMNS,
-            vertical_char=' ', horizontal_char=' ', junction_char=' ',
-            hrules=NONE)
-        t.align['Subtopics'] = 'l'
-        t.align['Topics'] = 'l'
-        t.align['Samples'] = 'l'
+        t = self._table(['Subtopics', 'Topics', 'Samples'])
         for parent in parents:
             full_parent = parent
             if top_level:
@@ -48,45 +44,109 @@ class Output(object):
         return t
 
     def output_list(self, topic_repo_list):
-        t = PrettyTable(
-            ['Repo', 'Key', 'Summary'],
-            padding_width=0,
-            style=PLAIN_COLUMNS,
-            vertical_char=' ', horizontal_char=' ', junction_char=' ',
-            hrules=NONE)
-        t.align['Repo'] = 'l'
-        t.align['Key'] = 'l'
-        t.align['Summary'] = 'l'
+        t = self._table(['Repo', 'Key', 'Summary'])
         for (repo, topic) in topic_repo_list:
             t.add_row([repo, topic.key, topic.summary])
         return t
 
+    def output_update(self, update_results):
+        t = self._table(['Repo', 'Status', 'Detail'])
+        for (repo, status, detail) in update_results:
+            t.add_row([repo, status, detail])
+        return t
+
+    def output_build(self, build_results):
+        t = self._table(['Repo', 'Topics', 'Rendered', 'Reused'])
+        for (repo, topics, rendered, reused) in build_results:
+            t.add_row([repo, topics, rendered, reused])
+        return t
+
     def output_meta(self, meta_results):
-        t = PrettyTable(
-            ['Score', 'Repo', 'Key', 'Summary'],
-            padding_width=0,
-            style=PLAIN_COLUMNS,
-            vertical_char=' ', horizontal_char=' ', junction_char=' ',
-            hrules=NONE)
-        t.align['Score'] = 'l'
-        t.align['Repo'] = 'l'
-        t.align['Key'] = 'l'
-        t.align['Summary'] = 'l'
+        t = self._table(['Score', 'Repo', 'Key', 'Summary'])
         for meta in meta_results:
             t.add_row(
                 [meta[0], meta[1], meta[2].key, meta[2].summary])
         return t
 
+    def output_explain(self, lookup, meta_results):
+        """
+        Returns the scores of each part of the results for lookup: the
+        shortkey, key, meta tag and summary scores are weighed and added up
+        to make the score.
+        """
+        t = self._table(
+            ['Score', 'Repo', 'Key', 'Shortkey', 'Full key', 'Meta',
+             'Summary'])
+        for meta in meta_results:
+            t.add_row(
+                [meta[0], meta[1], meta[2].key] +
+                list(meta[2].meta_scores(lookup)))
+        return t
+
+    def topic_record(self, score, repo, topic, lookup=None):
+        """
+        Returns a topic as a dict for JSON output. The path and text of the
+        topic are only added when with_text is set, and the scores making up
+        score only when lookup is given.
+        """
+        record = {
+            'key': str(topic.key),
+            'repo': repo,
+            'score': score,
+            'summary': topic.summary,
+        }
+        if self.with_text:
+            record['path'] = os.path.join(topic.rootpath, topic.path)
+            record['text'] = topic.text
+        if lookup is not None:
+            record['scores'] = dict(zip(
+                ['shortkey', 'key', 'meta', 'summary'],
+                topic.meta_scores(lookup)))
+        return record
+
+    def output_json(self, record):
+        return json.dumps(record)
+
+    def output_timings(self, timings):
+        t = self._table(['Phase', 'Time (ms)'])
+        for name, ms in timings.milliseconds():
+            t.add_row([name, ms])
+        return t
+
 
 class MarkdownOutput(Output):
     def __init__(self, conf):
         super(MarkdownOutput, self).__init__(conf)
         self.conf = conf
         self.no_colors = False
+        self.cols = None
 
     def output_topic(self, topic):
+        return "\n".join(self.stream_topic(topic))
+
+    def stream_topic(self, topic):
+        """
+        Yields the topic rendered by mdv one block at a time, for a terminal
+        self.cols wide or the one eh runs in if it is not set. A rendering
+        made by eh --build or kept in the render cache is used instead when
+        there is one for the same text and settings; otherwise the blocks
+        are added to the render cache as they are rendered.
+        """
         pre_md = topic.text
-        md = mdv.main(pre_md, no_colors=self.no_colors)
-        lines = md.splitlines()
-        lines = [line for line in lines if line.strip()]
-        return "\n".join(lines)
+        if pre_md is None:
+            return
+        cols = self.cols or render_cache.terminal_columns()
+        cache = render_cache.RenderCache(config.get_int_option(
+            self.conf, constants.CONF_EH, constants.CONF_RENDER_CACHE_SIZE,
+            constants.DEFAULT_RENDER_CACHE_SIZE))
+        key = cache.make_key(
+            pre_md, self.no_colors, cols, render_cache.theme())
+        rendered = render_pack.RenderPack(topic.rootpath).get(key)
+        if rendered is None:
+            rendered = cache.get(key)
+        if rendered is not None:
+            yield rendered
+            return
+        for block in cache.store(key, render_cache.render_blocks(
+                pre_md, self.no_colors, cols)):
+            yield block
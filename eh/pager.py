@@ -0,0 +1,51 @@
+import os
+import subprocess
+
+from eh import constants
+
+
+class Pager(object):
+    """
+    The Pager class hands messages to a pager as they are produced, so a
+    long topic can be read while the rest of it is still being rendered.
+
+    $PAGER is used if it is set, otherwise less, which quits on its own when
+    everything fits on one screen. The pager is started with the first
+    message; once it is quit every further message is dropped.
+    """
+    def __init__(self, command=None):
+        self.command = (
+            command or os.environ.get('PAGER') or constants.DEFAULT_PAGER)
+        self._process = None
+        self._closed = False
+
+    def _start(self):
+        env = dict(os.environ)
+        env.setdefault('LESS', constants.DEFAULT_LESS)
+        self._process = subprocess.Popen(
+            self.command, shell=True, stdin=subprocess.PIPE, env=env)
+
+    def echo(self, message):
+        if self._closed:
+            return
+        try:
+            if self._process is None:
+                self._start()
+            self._process.stdin.write(
+                ('%s%s' % (message, constants.CR_CHAR)).encode('utf-8'))
+            self._process.stdin.flush()
+        except (IOError, OSError):
+            self._closed = True
+
+    def close(self):
+        """
+        Wait for the pager to be quit.
+        """
+        self._closed = True
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+        except (IOError, OSError):
+            pass
+        self._process.wait()
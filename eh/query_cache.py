@@ -0,0 +1,111 @@
+import collections
+import json
+import os
+
+from eh import constants
+
+
+class QueryCache(object):
+    """
+    The QueryCache class is a persistent record of the meta_search results
+    of a single topic store.
+
+    It is saved as JSON under constants.CACHE_DIR using the name of the
+    store. Results are kept as [score, key] pairs under the lookup and the
+    min_score they were searched with:
+
+        entries = {
+            "git/rebase\n35": [[74.2, "git/rebase"], [41.0, "git/reset"]]
+        }
+
+    version is the version stamp of the store the results were computed
+    from. When the stamp of the store changes every entry is dropped, so a
+    change to one store never affects what is cached for the others.
+
+    Entries are kept in least recently used order; once there are more than
+    size entries the least recently used ones are dropped. A hit only moves
+    its entry in memory, so answering from the cache never writes it; the
+    new order is saved along with the next entry added.
+    """
+    def __init__(self, name, version, size=constants.DEFAULT_QUERY_CACHE_SIZE):
+        self.name = name
+        self.version = version
+        self.size = size
+        self.path = os.path.join(
+            constants.CACHE_DIR, '%s%s' % (name, constants.INDEX_EXT))
+        self.entries = collections.OrderedDict()
+        self.dirty = False
+
+    @staticmethod
+    def make_key(lookup, min_score, parent=None):
+        key = '%s%s%s' % (lookup, constants.CR_CHAR, min_score)
+        if parent is not None:
+            key = '%s%s%s' % (key, constants.CR_CHAR, parent)
+        return key
+
+    def load(self):
+        """
+        Load the cache from disk. A missing, unreadable or outdated cache
+        simply results in an empty cache.
+        """
+        self.entries = collections.OrderedDict()
+        self.dirty = False
+        try:
+            with open(self.path, 'r') as cache_file:
+                data = json.load(
+                    cache_file, object_pairs_hook=collections.OrderedDict)
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get('version') != constants.QUERY_CACHE_VERSION:
+            return
+        if data.get('store') != self.version:
+            self.dirty = True
+            return
+        self.entries = data.get('entries', collections.OrderedDict())
+
+    def save(self):
+        """
+        Write the cache to disk if anything changed since it was loaded,
+        through a temporary file like the TopicIndex.
+        """
+        if not self.dirty or self.size <= 0:
+            return
+        data = {
+            'version': constants.QUERY_CACHE_VERSION,
+            'store': self.version,
+            'entries': self.entries,
+        }
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            if not os.path.exists(constants.CACHE_DIR):
+                os.makedirs(constants.CACHE_DIR)
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(data, cache_file)
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError):
+            return
+        self.dirty = False
+
+    def get(self, lookup, min_score, parent=None):
+        """
+        Returns the cached [score, key] pairs for lookup and min_score (and
+        the parent the search was limited to), or None if there are none.
+        """
+        key = QueryCache.make_key(lookup, min_score, parent)
+        results = self.entries.get(key)
+        if results is None:
+            return None
+        self.entries.move_to_end(key)
+        return results
+
+    def put(self, lookup, min_score, results, parent=None):
+        if self.size <= 0:
+            return
+        key = QueryCache.make_key(lookup, min_score, parent)
+        self.entries[key] = [list(r) for r in results]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        self.dirty = True
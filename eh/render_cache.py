@@ -0,0 +1,238 @@
+import hashlib
+import os
+import re
+import shutil
+
+from eh import constants
+
+THEME_VARIABLES = [
+    'MDV_THEME', 'AXC_THEME', 'MDV_CODE_THEME', 'AXC_CODE_THEME']
+MDV_CONFIG = os.path.join(constants.USERHOME, '.mdv.py')
+LINK_DEFINITION = re.compile(r'^\s*\[[^\]]+\]:')
+
+
+def terminal_columns():
+    """
+    Returns the width mdv renders for, found the way mdv finds it but
+    without importing mdv: $width, then $COLUMNS, then the terminal.
+    """
+    for name in ['width', 'COLUMNS']:
+        try:
+            return int(os.environ[name])
+        except (KeyError, ValueError):
+            continue
+    return shutil.get_terminal_size((80, 200)).columns or 80
+
+
+def theme():
+    """
+    Returns everything outside of eh that changes how mdv styles a topic:
+    the theme variables and the modification time of ~/.mdv.py.
+    """
+    values = [
+        os.environ.get(name, constants.EMPTY) for name in THEME_VARIABLES]
+    try:
+        values.append(str(os.stat(MDV_CONFIG).st_mtime_ns))
+    except OSError:
+        values.append(constants.EMPTY)
+    return ' '.join(values)
+
+
+def split_blocks(text, size=None):
+    """
+    Yields text in blocks of about size (STREAM_BLOCK_LINES by default)
+    lines that can be rendered on their own. A block ends before a heading
+    once it has size lines, or at a blank line once it has four times that
+    many; never inside fenced code.
+    """
+    size = size or constants.STREAM_BLOCK_LINES
+    block = []
+    fence = None
+    for line in text.split(constants.CR_CHAR):
+        stripped = line.strip()
+        if fence is None:
+            if (
+                    len(block) >= size and stripped.startswith('#') or
+                    len(block) >= 4 * size and not stripped):
+                yield constants.CR_CHAR.join(block)
+                block = []
+            if stripped.startswith(('```', '~~~')):
+                fence = stripped[:3]
+        elif stripped.startswith(fence):
+            fence = None
+        block.append(line)
+    if block:
+        yield constants.CR_CHAR.join(block)
+
+
+def link_definitions(text):
+    """
+    Returns the reference link definitions of text, such as
+    "[docs]: http://example.com", outside of fenced code.
+    """
+    definitions = []
+    fence = None
+    for line in text.split(constants.CR_CHAR):
+        stripped = line.strip()
+        if fence is None:
+            if stripped.startswith(('```', '~~~')):
+                fence = stripped[:3]
+            elif LINK_DEFINITION.match(line):
+                definitions.append(line)
+        elif stripped.startswith(fence):
+            fence = None
+    return definitions
+
+
+def _stream_theme():
+    """
+    Returns the theme to render every block of a topic with. mdv picks a
+    random theme on every call unless one is set in the environment, so one
+    is picked here for the whole topic instead.
+    """
+    if os.environ.get('MDV_THEME') or os.environ.get('AXC_THEME'):
+        return None
+    import random
+    from mdv import markdownviewer
+    return random.choice(sorted(markdownviewer.read_themes()))
+
+
+def render_blocks(text, no_colors, cols):
+    """
+    Yields text rendered by mdv for a terminal cols wide, without blank
+    lines, one block at a time, so the first lines are ready as soon as
+    the first block is rendered whatever the size of text.
+    """
+    if text is None:
+        return
+    import mdv
+    theme = None if no_colors else _stream_theme()
+    definitions = constants.CR_CHAR.join(link_definitions(text))
+    for block in split_blocks(text):
+        if definitions:
+            # A reference link only renders if its definition is in the
+            # same block, so every block gets all of them.
+            block = '%s\n\n%s' % (block, definitions)
+        md = mdv.main(
+            block, no_colors=no_colors, cols=cols, theme=theme,
+            c_theme='default')
+        lines = [line for line in md.splitlines() if line.strip()]
+        if lines:
+            yield "\n".join(lines)
+
+
+def render(text, no_colors, cols):
+    """
+    Returns text rendered by mdv for a terminal cols wide, without blank
+    lines.
+    """
+    return "\n".join(render_blocks(text, no_colors, cols))
+
+
+class RenderCache(object):
+    """
+    The RenderCache class keeps the rendered text of topics as files under
+    constants.RENDER_DIR, named after a hash of everything the rendering
+    depends on:
+
+        ~/.eh/render/3f2a...e1.txt
+
+    A hit is one file read. The modification time of a file is refreshed on
+    every hit and once the files take more than size bytes the least
+    recently used ones are removed.
+    """
+    def __init__(self, size=constants.DEFAULT_RENDER_CACHE_SIZE):
+        self.size = size
+
+    @staticmethod
+    def make_key(text, no_colors, cols, theme):
+        digest = hashlib.sha1()
+        for part in [
+                constants.RENDER_CACHE_VERSION, bool(no_colors), cols, theme]:
+            digest.update(('%s%s' % (part, constants.CR_CHAR)).encode('utf-8'))
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def path(key):
+        return os.path.join(
+            constants.RENDER_DIR, '%s%s' % (key, constants.RENDER_EXT))
+
+    def get(self, key):
+        """
+        Returns the rendered text stored under key, or None.
+        """
+        if self.size <= 0:
+            return None
+        path = RenderCache.path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as render_file:
+                rendered = render_file.read()
+            os.utime(path)
+        except (IOError, OSError, ValueError):
+            return None
+        return rendered
+
+    def store(self, key, blocks):
+        """
+        Yields blocks while writing them under key. The rendering is only
+        kept once every block was written.
+        """
+        if self.size <= 0:
+            for block in blocks:
+                yield block
+            return
+        path = RenderCache.path(key)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            if not os.path.exists(constants.RENDER_DIR):
+                os.makedirs(constants.RENDER_DIR)
+            render_file = open(tmp_path, 'w', encoding='utf-8')
+        except (IOError, OSError):
+            for block in blocks:
+                yield block
+            return
+        done = False
+        try:
+            separator = constants.EMPTY
+            for block in blocks:
+                render_file.write(separator + block)
+                separator = constants.CR_CHAR
+                yield block
+            done = True
+        finally:
+            render_file.close()
+            try:
+                if done:
+                    os.replace(tmp_path, path)
+                else:
+                    os.remove(tmp_path)
+            except OSError:
+                done = False
+        if done:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used files until the rest fit in size
+        bytes.
+        """
+        entries = []
+        try:
+            with os.scandir(constants.RENDER_DIR) as it:
+                for entry in it:
+                    if not entry.name.endswith(constants.RENDER_EXT):
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
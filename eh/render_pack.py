@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+
+from eh import constants
+from eh import render_cache
+
+
+class RenderPack(object):
+    """
+    The RenderPack class holds the pre-rendered text of every topic of a
+    single store, written by eh --build, in one file under
+    constants.RENDER_DIR.
+
+    The pack of a store is found from the path of the store alone, so a
+    topic knows where its pack is. The first line of the file is a JSON
+    header giving the offset and length of every rendering in the bytes
+    that follow it, under the same keys as the RenderCache:
+
+        {"version": 1, "store": "eh_subjects", "filepath": "...",
+         "entries": {"3f2a...e1": [0, 812], ...}}
+
+    A lookup reads the header and a single rendering. A rendering is only
+    found while the topic text, color setting, width and theme it was
+    made for are unchanged, as all of them make up its key.
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.path = RenderPack.pack_path(filepath)
+        self.entries = None
+        self.base = 0
+
+    @staticmethod
+    def pack_path(filepath):
+        digest = hashlib.sha1(
+            (filepath or constants.EMPTY).encode('utf-8')).hexdigest()
+        return os.path.join(
+            constants.RENDER_DIR, '%s%s' % (digest, constants.PACK_EXT))
+
+    def load(self):
+        """
+        Read the header of the pack. A missing, unreadable or outdated pack
+        simply has no entries.
+        """
+        self.entries = {}
+        try:
+            with open(self.path, 'rb') as pack_file:
+                header = json.loads(pack_file.readline().decode('utf-8'))
+                self.base = pack_file.tell()
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(header, dict):
+            return
+        if header.get('version') != constants.RENDER_PACK_VERSION:
+            return
+        if header.get('filepath') != self.filepath:
+            return
+        self.entries = header.get('entries', {})
+
+    def __contains__(self, key):
+        if self.entries is None:
+            self.load()
+        return key in self.entries
+
+    def get(self, key):
+        """
+        Returns the rendering stored under key, or None.
+        """
+        if key not in self:
+            return None
+        offset, length = self.entries[key]
+        try:
+            with open(self.path, 'rb') as pack_file:
+                pack_file.seek(self.base + offset)
+                return pack_file.read(length).decode('utf-8')
+        except (IOError, OSError, ValueError):
+            return None
+
+    def write(self, name, renderings):
+        """
+        Replace the pack with renderings, a dict of key -> rendered text.
+        """
+        entries = {}
+        bodies = []
+        offset = 0
+        for key in sorted(renderings):
+            body = renderings[key].encode('utf-8')
+            entries[key] = [offset, len(body)]
+            bodies.append(body)
+            offset += len(body)
+        header = json.dumps({
+            'version': constants.RENDER_PACK_VERSION,
+            'store': name,
+            'filepath': self.filepath,
+            'entries': entries,
+        }, separators=(',', ':'))
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            if not os.path.exists(constants.RENDER_DIR):
+                os.makedirs(constants.RENDER_DIR)
+            with open(tmp_path, 'wb') as pack_file:
+                pack_file.write((header + constants.CR_CHAR).encode('utf-8'))
+                for body in bodies:
+                    pack_file.write(body)
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError):
+            return
+        self.entries = None
+
+
+def build(store, cols, theme, pool):
+    """
+    Render every topic of store both with and without colors on pool, a
+    process pool, and write them to the pack of the store. Renderings the
+    pack already has for the same key are kept as they are.
+
+    Returns (rendered, reused) counts.
+    """
+    pack = RenderPack(store.filepath)
+    pack.load()
+    renderings = {}
+    pending = {}
+    for t in store.get_all_topics():
+        text = t.text
+        if text is None:
+            continue
+        for no_colors in [False, True]:
+            key = render_cache.RenderCache.make_key(
+                text, no_colors, cols, theme)
+            if key in renderings or key in pending:
+                continue
+            rendered = pack.get(key)
+            if rendered is None:
+                pending[key] = (text, no_colors)
+            else:
+                renderings[key] = rendered
+    reused = len(renderings)
+    keys = sorted(pending)
+    results = pool.map(
+        render_cache.render, [pending[k][0] for k in keys],
+        [pending[k][1] for k in keys], [cols] * len(keys))
+    renderings.update(zip(keys, results))
+    pack.write(store.name, renderings)
+    return len(keys), reused
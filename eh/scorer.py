@@ -0,0 +1,128 @@
+from eh import constants
+
+
+class ScoreTable(object):
+    """
+    The ScoreTable class scores a lookup against many topics at once.
+
+    It gives the same scores as TopicKey.get_key_metascore, but everything
+    that only depends on a topic is computed once when the table is built
+    and kept in columns indexed by the position of the topic:
+
+        keys[i]            str(key)
+        shortkeys[i]       key.shortkey
+        metas[i]           ','.join(key.meta)
+        meta_tokens[i]     tokens of ' '.join(key.meta)
+        summaries[i]       summary
+        summary_tokens[i]  tokens of summary
+
+    Tokens are made the way fuzzywuzzy's token_set_ratio makes them, so
+    token_set_ratio is computed from the columns without processing the
+    strings of the topic again.
+
+    Ratios are computed by ScoreTable.ratio_function.
+    """
+    def __init__(self, topics):
+        from fuzzywuzzy import utils
+        self._process = (
+            lambda s: utils.full_process(s, force_ascii=True))
+        self._ratio = ScoreTable.ratio_function()
+        self.topics = list(topics)
+        self.keys = []
+        self.shortkeys = []
+        self.metas = []
+        self.meta_tokens = []
+        self.summaries = []
+        self.summary_tokens = []
+        for t in self.topics:
+            self.keys.append(str(t.key))
+            self.shortkeys.append(t.key.shortkey)
+            self.metas.append(','.join(t.key.meta))
+            self.meta_tokens.append(self.tokenize(' '.join(t.key.meta)))
+            self.summaries.append(t.summary)
+            self.summary_tokens.append(
+                None if t.summary is None else self.tokenize(t.summary))
+
+    def __len__(self):
+        return len(self.topics)
+
+    @staticmethod
+    def ratio_function():
+        """
+        Returns fuzz.ratio, or the same ratio computed directly with
+        rapidfuzz if it is installed next to python-Levenshtein (which is
+        what fuzz.ratio uses then).
+        """
+        from fuzzywuzzy import fuzz
+        from fuzzywuzzy import utils
+        try:
+            import Levenshtein  # noqa
+            from rapidfuzz.distance import Indel
+        except ImportError:
+            return fuzz.ratio
+
+        def ratio(s1, s2):
+            if s1 is None or s2 is None:
+                return 0
+            if s1 == s2:
+                return 100
+            if not s1 or not s2:
+                return 0
+            lensum = len(s1) + len(s2)
+            return utils.intr(
+                100 * ((lensum - Indel.distance(s1, s2)) / float(lensum)))
+        return ratio
+
+    def tokenize(self, text):
+        return set(self._process(text).split())
+
+    def _token_set_ratio(self, tokens1, tokens2):
+        """
+        fuzz.token_set_ratio for two already tokenized strings.
+        """
+        if not tokens1 or not tokens2:
+            return 0
+        ratio = self._ratio
+        sorted_sect = ' '.join(sorted(tokens1 & tokens2))
+        combined_1to2 = (
+            sorted_sect + ' ' + ' '.join(sorted(tokens1 - tokens2))).strip()
+        combined_2to1 = (
+            sorted_sect + ' ' + ' '.join(sorted(tokens2 - tokens1))).strip()
+        return max(
+            ratio(sorted_sect, combined_1to2),
+            ratio(sorted_sect, combined_2to1),
+            ratio(combined_1to2, combined_2to1))
+
+    def scores(self, lookup, positions=None):
+        """
+        Returns the metascore of lookup for the topics at positions (all of
+        them by default), in the same order.
+        """
+        if positions is None:
+            positions = range(len(self.topics))
+        ratio = self._ratio
+        tokens = self.tokenize(lookup.replace(constants.KEY_DIVIDE_CHAR, ' '))
+        out = []
+        for i in positions:
+            key = self.keys[i]
+            key_score = (
+                constants.MATCH if lookup == key else ratio(lookup, key))
+            if key_score == constants.MATCH:
+                out.append(constants.MATCH)
+                continue
+            shortkey = self.shortkeys[i]
+            short_score = (
+                constants.MATCH if lookup == shortkey else
+                ratio(lookup, shortkey))
+            meta_score = (
+                constants.MATCH if lookup == self.metas[i] else
+                self._token_set_ratio(tokens, self.meta_tokens[i]))
+            summary_score = (
+                constants.MATCH if lookup == self.summaries[i] else
+                self._token_set_ratio(tokens, self.summary_tokens[i]))
+            out.append(
+                short_score * constants.SHORTKEY_WEIGHT +
+                key_score * constants.KEY_WEIGHT +
+                meta_score * constants.META_WEIGHT +
+                summary_score * constants.SUMMARY_WEIGHT)
+        return out
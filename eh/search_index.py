@@ -0,0 +1,166 @@
+import collections
+import math
+
+from eh import constants
+from eh import scorer
+
+
+class SearchIndex(object):
+    """
+    The SearchIndex class is an inverted index over the topics of a single
+    store that lets meta_search skip the fuzzy scoring of topics that cannot
+    reach the search score.
+
+    Two posting lists are kept, both mapping to positions in topics:
+
+        grams = {"com": {0, 4}, ...}     trigrams of keys and shortkeys
+        tokens = {"commit": {0}, ...}    tokens of meta tags and summaries
+
+    The tokens are made exactly the way fuzzywuzzy's token_set_ratio makes
+    them. Topics sharing a trigram or a token with the lookup are plausible
+    and always scored. Any other topic is only scored if an upper bound of
+    its metascore is above the search score. The bound counts the characters
+    the strings compared by TopicKey have in common, which is never less
+    than what the fuzzy matcher finds, so pruning never changes the results.
+    """
+    GRAM_SIZE = 3
+
+    def __init__(self, topics):
+        self.table = scorer.ScoreTable(topics)
+        self.topics = self.table.topics
+        self.grams = collections.defaultdict(set)
+        self.tokens = collections.defaultdict(set)
+        self._fields = []
+        self._subtrees = None
+        for position in range(len(self.topics)):
+            self._add(position)
+
+    def __len__(self):
+        return len(self.topics)
+
+    def _add(self, position):
+        table = self.table
+        key = table.keys[position]
+        meta_tokens = table.meta_tokens[position]
+        summary_tokens = table.summary_tokens[position] or set()
+        for gram in SearchIndex.make_grams(key):
+            self.grams[gram].add(position)
+        for token in meta_tokens | summary_tokens:
+            self.tokens[token].add(position)
+        self._fields.append((
+            key, SearchIndex._chars(key),
+            table.shortkeys[position],
+            SearchIndex._chars(table.shortkeys[position]),
+            table.metas[position], SearchIndex._token_chars(meta_tokens),
+            table.summaries[position],
+            SearchIndex._token_chars(summary_tokens)))
+
+    @staticmethod
+    def make_grams(text):
+        size = SearchIndex.GRAM_SIZE
+        return set(text[i:i + size] for i in range(len(text) - size + 1))
+
+    @staticmethod
+    def _chars(text):
+        return (collections.Counter(text), len(text))
+
+    @staticmethod
+    def _token_chars(tokens):
+        """
+        The characters token_set_ratio compares when no token is shared: the
+        sorted tokens joined by spaces.
+        """
+        if not tokens:
+            return (collections.Counter(), 0)
+        return SearchIndex._chars(' '.join(sorted(tokens)))
+
+    @staticmethod
+    def _ratio_bound(chars, other):
+        """
+        Returns an upper bound of fuzz.ratio for two strings given their
+        (Counter, length) pairs.
+        """
+        counter, length = chars
+        other_counter, other_length = other
+        if not length or not other_length:
+            return 0
+        common = 0
+        for c, count in counter.items():
+            common += min(count, other_counter.get(c, 0))
+        return min(
+            constants.MATCH,
+            math.ceil(200.0 * common / (length + other_length)))
+
+    def bound(self, position, lookup, chars, token_chars):
+        """
+        Returns an upper bound of the metascore of the topic at position for
+        a lookup that shares no token with its meta tags or summary.
+        """
+        (key, key_chars, shortkey, short_chars, meta, meta_chars,
+            summary, summary_chars) = self._fields[position]
+        if lookup == key:
+            return constants.MATCH
+        key_score = SearchIndex._ratio_bound(chars, key_chars)
+        short_score = (
+            constants.MATCH if lookup == shortkey else
+            SearchIndex._ratio_bound(chars, short_chars))
+        meta_score = (
+            constants.MATCH if lookup == meta else
+            SearchIndex._ratio_bound(token_chars, meta_chars))
+        summary_score = (
+            constants.MATCH if lookup == summary else
+            SearchIndex._ratio_bound(token_chars, summary_chars))
+        return (
+            short_score * constants.SHORTKEY_WEIGHT +
+            key_score * constants.KEY_WEIGHT +
+            meta_score * constants.META_WEIGHT +
+            summary_score * constants.SUMMARY_WEIGHT)
+
+    def subtree(self, parent):
+        """
+        Returns the positions of the topics below parent, in the order they
+        were indexed.
+        """
+        if self._subtrees is None:
+            self._subtrees = collections.defaultdict(list)
+            for position, key in enumerate(self.table.keys):
+                parts = key.split(constants.KEY_DIVIDE_CHAR)
+                for i in range(1, len(parts)):
+                    self._subtrees[
+                        constants.KEY_DIVIDE_CHAR.join(parts[:i])].append(
+                            position)
+        return self._subtrees.get(parent, [])
+
+    def candidate_positions(self, lookup, min_score=0, parent=None):
+        """
+        Returns the positions of the topics that may score above min_score
+        for lookup, in the order they were indexed. Only topics below parent
+        are considered if it is given.
+        """
+        tokens = self.table.tokenize(
+            lookup.replace(constants.KEY_DIVIDE_CHAR, ' '))
+        plausible = set()
+        for gram in SearchIndex.make_grams(lookup):
+            plausible.update(self.grams.get(gram, ()))
+        for token in tokens:
+            plausible.update(self.tokens.get(token, ()))
+        chars = SearchIndex._chars(lookup)
+        token_chars = SearchIndex._token_chars(tokens)
+        positions = (
+            range(len(self.topics)) if parent is None else
+            self.subtree(parent))
+        return [
+            position for position in positions
+            if position in plausible or
+            self.bound(position, lookup, chars, token_chars) > min_score]
+
+    def search(self, lookup, min_score=0, parent=None):
+        """
+        Returns (score, topic) for every candidate scoring above 0, scored
+        in one pass by the ScoreTable.
+        """
+        positions = self.candidate_positions(lookup, min_score, parent)
+        scores = self.table.scores(lookup, positions)
+        return [
+            (score, self.topics[position])
+            for score, position in zip(scores, positions) if score > 0]
@@ -0,0 +1,125 @@
+import unicodedata
+
+from eh import constants
+
+ELLIPSIS = '…'
+
+
+def display_width(text):
+    """
+    Returns the number of terminal columns text takes: wide characters take
+    two and combining characters none.
+    """
+    if text.isascii():
+        return len(text)
+    width = 0
+    for c in text:
+        if unicodedata.combining(c):
+            continue
+        width += 2 if unicodedata.east_asian_width(c) in 'WF' else 1
+    return width
+
+
+def truncate(text, width):
+    """
+    Returns text cut to at most width columns, ending in an ellipsis if
+    anything was cut.
+    """
+    if display_width(text) <= width:
+        return text
+    if text.isascii():
+        return text[:max(width - 1, 0)] + ELLIPSIS
+    out = []
+    used = 0
+    for c in text:
+        w = display_width(c)
+        if used + w > width - 1:
+            break
+        out.append(c)
+        used += w
+    return constants.EMPTY.join(out) + ELLIPSIS
+
+
+class Table(object):
+    """
+    The Table class writes rows as left aligned columns separated by a
+    space, with the column names on the first line:
+
+         Repo        Key        Summary
+         eh_default  eh/help    How to use eh
+
+    Cells are turned into strings once, as rows are added, and the width of
+    every column is kept up to date along the way, so writing the table is a
+    single pass over the rows. A cell with several lines makes the row that
+    many lines high.
+
+    If width is given the last column is cut so that no line is wider than
+    width columns.
+    """
+    def __init__(self, columns, width=None):
+        self.columns = [str(c) for c in columns]
+        self.width = width
+        self.widths = [display_width(c) for c in self.columns]
+        self.rows = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __str__(self):
+        return constants.CR_CHAR.join(self.lines())
+
+    def add_row(self, row):
+        cells = ['%s' % cell for cell in row]
+        widths = self.widths
+        for i, cell in enumerate(cells):
+            if constants.CR_CHAR in cell:
+                cells[i] = cell = cell.split(constants.CR_CHAR)
+                w = max(display_width(part) for part in cell)
+            else:
+                w = display_width(cell)
+            if w > widths[i]:
+                widths[i] = w
+        self.rows.append(cells)
+
+    def _column_widths(self):
+        widths = list(self.widths)
+        if self.width is None:
+            return widths
+        # One leading space and one space after every column.
+        room = self.width - sum(widths[:-1]) - len(widths) - 1
+        widths[-1] = max(min(widths[-1], room), 1)
+        return widths
+
+    def lines(self):
+        """
+        Yields the table one line at a time.
+        """
+        widths = self._column_widths()
+        last = widths[-1]
+        cut = last < self.widths[-1]
+        for cells in [self.columns] + self.rows:
+            if any(isinstance(cell, list) for cell in cells):
+                for line in self._split_row(cells):
+                    yield self._line(line, widths, last, cut)
+            else:
+                yield self._line(cells, widths, last, cut)
+
+    @staticmethod
+    def _split_row(cells):
+        parts = [
+            cell if isinstance(cell, list) else [cell] for cell in cells]
+        for i in range(max(len(p) for p in parts)):
+            yield [p[i] if i < len(p) else constants.EMPTY for p in parts]
+
+    @staticmethod
+    def _line(cells, widths, last, cut):
+        if cut:
+            cells = cells[:-1] + [truncate(cells[-1], last)]
+        out = [constants.EMPTY]
+        for cell, w in zip(cells, widths):
+            if cell.isascii():
+                out.append(cell.ljust(w))
+            else:
+                out.append(cell + ' ' * (w - display_width(cell)))
+        out.append(constants.EMPTY)
+        return ' '.join(out)
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import mock
+
+from eh import autocomplete
+from eh import completion
+from eh.tests import base_test as base
+
+
+HEAVY_MODULES = [
+    'git', 'mdv', 'yaml', 'fuzzywuzzy', 'prettytable', 'click']
+
+
+class TestAutocomplete(base.TestCase):
+    def setUp(self):
+        super(TestAutocomplete, self).setUp()
+        trie = completion.CompletionTrie()
+        for word in [
+                'git', os.path.join('git', 'rebase'),
+                os.path.join('git', 'reset'), 'github']:
+            trie.add(word)
+        self.patch1 = mock.patch(
+            'eh.completion.CompletionTrie.load', return_value=trie)
+        self.patch1.start()
+
+    def tearDown(self):
+        super(TestAutocomplete, self).tearDown()
+        mock.patch.stopall()
+
+    def test_complete_key(self):
+        self.assertEqual(
+            ['git', 'github'],
+            autocomplete.completion_hook('eh', 'gi', 'eh', 'eh gi'))
+
+    def test_complete_joined_words(self):
+        self.assertEqual(
+            ['rebase', 'reset'],
+            autocomplete.completion_hook('eh', 're', 'git', 'eh git re'))
+        self.assertEqual(
+            ['rebase', 'reset'],
+            autocomplete.completion_hook('eh', '', 'git', 'eh git '))
+
+    def test_skips_options(self):
+        self.assertEqual(
+            ['rebase', 'reset'],
+            autocomplete.completion_hook(
+                'eh', 're', 'git', 'eh --repo mine --no-colors git re'))
+        self.assertEqual(
+            [], autocomplete.completion_hook('eh', '--r', 'eh', 'eh --r'))
+        self.assertEqual(
+            [], autocomplete.completion_hook('eh', '', '--repo', 'eh --repo '))
+
+    def test_import_does_not_load_heavy_modules(self):
+        code = (
+            "import sys; import eh.autocomplete; "
+            "print(','.join(m for m in %r if m in sys.modules))" %
+            HEAVY_MODULES)
+        out = subprocess.check_output(
+            [sys.executable, '-c', code], universal_newlines=True)
+        self.assertEqual('', out.strip())
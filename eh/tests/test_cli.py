@@ -0,0 +1,18 @@
+import subprocess
+import sys
+
+from eh.tests import base_test as base
+
+
+HEAVY_MODULES = ['git', 'mdv', 'yaml', 'fuzzywuzzy', 'prettytable']
+
+
+class TestCli(base.TestCase):
+    def test_import_does_not_load_heavy_modules(self):
+        code = (
+            "import sys; import eh.cli; "
+            "print(','.join(m for m in %r if m in sys.modules))" %
+            HEAVY_MODULES)
+        out = subprocess.check_output(
+            [sys.executable, '-c', code], universal_newlines=True)
+        self.assertEqual('', out.strip())
@@ -0,0 +1,90 @@
+import json
+
+import mock
+
+from eh import commands
+from eh.tests import base_test as base
+
+
+def _topic(key, summary):
+    t = mock.Mock()
+    t.key = key
+    t.summary = summary
+    t.rootpath = '/store/'
+    t.path = '%s.md' % key
+    t.text = 'text of %s' % key
+    t.meta_scores.return_value = (1, 2, 3, 4)
+    return t
+
+
+class TestCommands(base.TestCase):
+    def setUp(self):
+        super(TestCommands, self).setUp()
+        self.manager = mock.Mock()
+        self.commit = _topic('git/commit', 'Commit things')
+        self.clone = _topic('git/clone', 'Clone things')
+        self.lines = []
+        self.options = commands.make_options(
+            ['git', 'commit'], [], True, False, 50, 35,
+            output_format='json')
+
+    def _run(self, options=None):
+        commands.run(
+            None, self.manager, options or self.options, self.lines.append)
+        return [json.loads(line) for line in '\n'.join(self.lines).split(
+            '\n')]
+
+    def test_pick_result(self):
+        self.assertIsNone(commands.pick_result([], 50))
+        self.assertEqual(
+            (60, 'r', 'a'), commands.pick_result([(60, 'r', 'a')], 50))
+        self.assertIsNone(commands.pick_result([(40, 'r', 'a')], 50))
+        self.assertEqual(
+            (90, 'r', 'a'),
+            commands.pick_result([(90, 'r', 'a'), (60, 'r', 'b')], 50))
+        self.assertIsNone(
+            commands.pick_result([(70, 'r', 'a'), (60, 'r', 'b')], 50))
+
+    def test_json_lookup(self):
+        self.manager.meta_search.return_value = [
+            (100, 'repo', self.commit), (40, 'repo', self.clone)]
+        records = self._run()
+        self.assertEqual(1, len(records))
+        self.assertEqual('git/commit', records[0]['subject'])
+        self.assertEqual({
+            'key': 'git/commit', 'repo': 'repo', 'score': 100,
+            'summary': 'Commit things'}, records[0]['topic'])
+        self.assertEqual(
+            ['git/commit', 'git/clone'],
+            [r['key'] for r in records[0]['results']])
+
+    def test_json_lookup_with_text_and_scores(self):
+        self.manager.meta_search.return_value = [
+            (60, 'repo', self.commit), (55, 'repo', self.clone)]
+        options = dict(self.options, with_text=True, explain=True)
+        record = self._run(options)[0]
+        self.assertIsNone(record['topic'])
+        self.assertEqual('/store/git/commit.md', record['results'][0]['path'])
+        self.assertEqual('text of git/commit', record['results'][0]['text'])
+        self.assertEqual(
+            {'shortkey': 1, 'key': 2, 'meta': 3, 'summary': 4},
+            record['results'][0]['scores'])
+
+    def test_json_list(self):
+        self.manager.get_all_topics.return_value = [
+            ('repo', self.commit), ('repo', self.clone)]
+        records = self._run(dict(self.options, list=True))
+        self.assertEqual(
+            ['git/clone', 'git/commit'], [r['key'] for r in records])
+        self.assertIsNone(records[0]['score'])
+
+    def test_batch(self):
+        self.manager.meta_search.return_value = [(100, 'repo', self.commit)]
+        commands.run_batch(
+            None, self.manager, self.options,
+            ['git commit\n', '\n', 'git  clone\n'], self.lines.append)
+        self.assertEqual(2, len(self.lines))
+        self.assertEqual(
+            ['git/commit', 'git/clone'],
+            [json.loads(line)['subject'] for line in self.lines])
+        self.assertEqual(2, self.manager.meta_search.call_count)
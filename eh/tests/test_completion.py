@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+
+from eh import completion
+from eh.tests import base_test as base
+
+
+class TestCompletionTrie(base.TestCase):
+    def setUp(self):
+        super(TestCompletionTrie, self).setUp()
+        self.words = [
+            'git', 'git/rebase', 'git/reset', 'git/remote/add', 'github',
+            'docker']
+        self.trie = completion.CompletionTrie()
+        for word in self.words:
+            self.trie.add(word)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'completion.trie')
+
+    def tearDown(self):
+        super(TestCompletionTrie, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_complete_all(self):
+        self.assertEqual(sorted(self.words), self.trie.complete(''))
+
+    def test_complete_prefix(self):
+        self.assertEqual(
+            ['git/rebase', 'git/remote/add', 'git/reset'],
+            self.trie.complete('git/re'))
+        self.assertEqual(['git/reset'], self.trie.complete('git/res'))
+        self.assertEqual(['github'], self.trie.complete('gith'))
+        self.assertEqual([], self.trie.complete('gitz'))
+        self.assertEqual([], self.trie.complete('x'))
+
+    def test_complete_word_inside_edge(self):
+        self.assertEqual(['docker'], self.trie.complete('doc'))
+
+    def test_edges_are_merged(self):
+        self.assertIn('docker', self.trie.root[1])
+
+    def test_write_and_load(self):
+        completion.CompletionTrie.write(self.words, self.path)
+        trie = completion.CompletionTrie.load(self.path)
+        self.assertEqual(sorted(self.words), trie.complete(''))
+
+    def test_write_skipped_when_unchanged(self):
+        completion.CompletionTrie.write(self.words, self.path)
+        mtime = os.stat(self.path).st_mtime_ns
+        os.utime(self.path, ns=(0, 0))
+        completion.CompletionTrie.write(reversed(self.words), self.path)
+        self.assertEqual(0, os.stat(self.path).st_mtime_ns)
+        completion.CompletionTrie.write(['other'], self.path)
+        self.assertNotEqual(0, os.stat(self.path).st_mtime_ns)
+        self.assertTrue(mtime)
+
+    def test_load_missing_is_empty(self):
+        trie = completion.CompletionTrie.load(self.path)
+        self.assertEqual([], trie.complete(''))
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import threading
+
+import mock
+
+from eh import daemon
+from eh.tests import base_test as base
+
+
+class TestDaemon(base.TestCase):
+    def setUp(self):
+        super(TestDaemon, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'eh.sock')
+        self.daemon = daemon.EhDaemon(self.socket_path)
+        self.options = {
+            'subject': ['help'], 'repos': [], 'no_colors': False,
+            'list': False, 'min_score': 50, 'search_score': 35,
+        }
+
+    def tearDown(self):
+        super(TestDaemon, self).tearDown()
+        mock.patch.stopall()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_ping(self):
+        self.assertEqual({'output': 'pong'}, self.daemon.handle(
+            {'action': 'ping'}))
+
+    def test_unknown_action(self):
+        self.assertIn('error', self.daemon.handle({'action': 'nope'}))
+
+    def test_run_error_is_returned(self):
+        with mock.patch.object(self.daemon, 'run') as mock_run:
+            mock_run.side_effect = ValueError('boom')
+            response = self.daemon.handle(
+                {'action': 'run', 'options': self.options})
+        self.assertEqual({'error': 'boom'}, response)
+
+    @mock.patch('eh.topic_manager.TopicManager')
+    @mock.patch('eh.commands.open_config')
+    @mock.patch('eh.commands.run')
+    def test_run_caches_output_and_manager(
+            self, mock_run, mock_config, mock_manager):
+        mock_run.side_effect = (
+            lambda conf, manager, options, echo: echo('rendered'))
+        mock_manager.return_value.refresh.return_value = False
+        self.assertEqual('rendered', self.daemon.run(self.options))
+        self.assertEqual('rendered', self.daemon.run(self.options))
+        self.assertEqual(1, mock_run.call_count)
+        self.assertEqual(1, mock_config.call_count)
+
+        other = dict(self.options, subject=['other'])
+        self.daemon.run(other)
+        self.assertEqual(2, mock_run.call_count)
+        self.assertEqual(1, mock_manager.call_count)
+
+    @mock.patch('eh.topic_manager.TopicManager')
+    @mock.patch('eh.commands.open_config')
+    @mock.patch('eh.commands.run')
+    def test_reload_drops_cache(self, mock_run, mock_config, mock_manager):
+        self.daemon.run(self.options)
+        self.daemon.handle({'action': 'reload'})
+        self.daemon.run(self.options)
+        self.assertEqual(2, mock_run.call_count)
+        self.assertEqual(2, mock_config.call_count)
+        self.assertEqual(2, mock_manager.call_count)
+
+    @mock.patch('eh.topic_manager.TopicManager')
+    @mock.patch('eh.commands.open_config')
+    @mock.patch('eh.commands.run')
+    def test_changed_stores_drop_cache(
+            self, mock_run, mock_config, mock_manager):
+        manager = mock_manager.return_value
+        manager.refresh.return_value = False
+        self.daemon.run(self.options)
+        self.daemon.run(self.options)
+        self.assertEqual(1, mock_run.call_count)
+        manager.refresh.return_value = True
+        self.daemon.run(self.options)
+        self.assertEqual(2, mock_run.call_count)
+        self.assertEqual(1, mock_manager.call_count)
+        self.assertEqual(2, manager.write_completion.call_count)
+
+    def test_send_without_daemon_returns_none(self):
+        self.assertIsNone(
+            daemon.send_command(self.options, self.socket_path))
+
+    def test_send_with_stale_socket_returns_none(self):
+        open(self.socket_path, 'w').close()
+        self.assertIsNone(
+            daemon.send_command(self.options, self.socket_path))
+
+    def test_round_trip(self):
+        server = self.daemon.make_server()
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with mock.patch.object(self.daemon, 'run') as mock_run:
+                mock_run.return_value = 'from daemon'
+                output = daemon.send_command(self.options, self.socket_path)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        self.assertEqual('from daemon', output)
+        mock_run.assert_called_once_with(self.options)
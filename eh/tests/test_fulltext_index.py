@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+
+import mock
+
+from eh import fulltext_index as fti
+from eh.tests import base_test as base
+
+
+class FakeTopic(object):
+    def __init__(self, path, text):
+        self.path = path
+        self._text = text
+        self.reads = 0
+
+    @property
+    def text(self):
+        self.reads += 1
+        return self._text
+
+
+class TestFullTextIndex(base.TestCase):
+    def setUp(self):
+        super(TestFullTextIndex, self).setUp()
+        self.index_dir = tempfile.mkdtemp()
+        self.patch1 = mock.patch('eh.constants.INDEX_DIR', self.index_dir)
+        self.patch1.start()
+        self.topics = [
+            FakeTopic('commit.md', 'git commit --amend\nfix the last commit'),
+            FakeTopic('push.md', 'git push --force-with-lease'),
+            FakeTopic('run.md', 'docker run -it ubuntu bash'),
+        ]
+        self.stats = dict((t.path, (1, 1)) for t in self.topics)
+        self.index = fti.FullTextIndex('test_store', '/store')
+        self.index.update(self.topics, self.stats)
+
+    def tearDown(self):
+        super(TestFullTextIndex, self).tearDown()
+        mock.patch.stopall()
+        shutil.rmtree(self.index_dir)
+
+    def test_tokenize(self):
+        self.assertEqual(
+            ['git', 'push', 'force-with-lease', 'v1.2'],
+            fti.FullTextIndex.tokenize('Git push --force-with-lease v1.2'))
+        self.assertEqual([], fti.FullTextIndex.tokenize(None))
+
+    def test_search_ranks_by_term_frequency(self):
+        results = self.index.search('commit')
+        self.assertEqual(['commit.md'], [p for s, p in results])
+        results = self.index.search('git amend')
+        self.assertEqual(['commit.md', 'push.md'], [p for s, p in results])
+        self.assertTrue(results[0][0] > results[1][0])
+
+    def test_search_limit_and_misses(self):
+        self.assertEqual(1, len(self.index.search('git', 1)))
+        self.assertEqual([], self.index.search('kubectl'))
+        self.assertEqual([], self.index.search(''))
+
+    def test_rare_terms_score_higher(self):
+        score = dict((p, s) for s, p in self.index.search('git docker'))
+        self.assertTrue(score['run.md'] > score['push.md'])
+
+    def test_update_only_reads_changed_topics(self):
+        self.stats['push.md'] = (2, 1)
+        self.topics[1]._text = 'git push --tags'
+        self.index.update(self.topics[1:], self.stats)
+        self.assertEqual(1, self.topics[0].reads)
+        self.assertEqual(2, self.topics[1].reads)
+        self.assertEqual(1, self.topics[2].reads)
+        self.assertEqual([], self.index.search('amend'))
+        self.assertEqual([], self.index.search('force-with-lease'))
+        self.assertEqual(
+            ['push.md'], [p for s, p in self.index.search('tags')])
+        self.assertNotIn('force-with-lease', self.index.postings)
+
+    def test_save_and_load(self):
+        self.assertFalse(self.index.is_current('digest'))
+        self.index.save('digest')
+        self.assertTrue(self.index.is_current('digest'))
+        self.assertFalse(self.index.is_current('other'))
+        loaded = fti.FullTextIndex('test_store', '/store')
+        loaded.load()
+        self.assertTrue(loaded.loaded)
+        self.assertEqual(self.index.search('git'), loaded.search('git'))
+
+    def test_load_other_filepath_is_empty(self):
+        self.index.save('digest')
+        loaded = fti.FullTextIndex('test_store', '/elsewhere')
+        loaded.load()
+        self.assertEqual({}, loaded.docs)
+
+    def test_load_corrupt_is_empty(self):
+        with open(self.index.path, 'w') as f:
+            f.write('digest\nnot json')
+        loaded = fti.FullTextIndex('test_store', '/store')
+        loaded.load()
+        self.assertEqual({}, loaded.docs)
+        self.assertTrue(os.path.exists(self.index.path))
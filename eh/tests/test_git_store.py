@@ -1,3 +1,7 @@
+import os
+import shutil
+import tempfile
+
 import git
 import mock
 
@@ -10,11 +14,17 @@ from eh import git_store as gs
 class TestGitStore(base.TestCase):
     def setUp(self):
         super(TestGitStore, self).setUp()
+        self.index_dir = tempfile.mkdtemp()
+        mock.patch('eh.constants.INDEX_DIR', self.index_dir).start()
         self.store = gs.GitTopicStore({}, "somerepo", "", "")
+        self.mock_shallow = mock.patch(
+            'eh.git_store.GitTopicStore._is_shallow').start()
+        self.mock_shallow.return_value = False
 
     def tearDown(self):
         super(TestGitStore, self).tearDown()
         mock.patch.stopall()
+        shutil.rmtree(self.index_dir)
 
     def test_create_git_store(self):
         self.assertIsNotNone(self.store)
@@ -41,12 +51,13 @@ class TestGitStore(base.TestCase):
     @mock.patch('os.makedirs', create=True)
     @mock.patch('git.Repo.clone_from', create=True)
     @mock.patch('eh.git_store.exit', create=True)
-    def test_init_repo_exit_on_giterror(
+    def test_init_repo_raises_on_giterror(
             self, mock_exit, mock_clone, mock_dirs, mock_exists):
         mock_exists.return_value = True
         mock_clone.side_effect = git.exc.GitCommandError("clone", "failboat")
-        self.store._init_repo()
-        self.assertEquals(1, mock_exit.call_count)
+        with self.assertRaises(exc.GitStoreError):
+            self.store._init_repo()
+        self.assertEquals(0, mock_exit.call_count)
 
     @mock.patch('os.path.exists', create=True)
     @mock.patch('os.makedirs', create=True)
@@ -107,3 +118,243 @@ class TestGitStore(base.TestCase):
         self.assertEquals(0, mock_git.call_count)
         self.assertEquals(0, mock_pull.call_count)
         self.assertEquals(1, mock_init.call_count)
+
+    def _make_git_dir(self, head, refs=None, packed=None):
+        self.repo_dir = tempfile.mkdtemp()
+        git_dir = os.path.join(self.repo_dir, '.git')
+        os.makedirs(os.path.join(git_dir, 'refs', 'heads'))
+        with open(os.path.join(git_dir, 'HEAD'), 'w') as f:
+            f.write(head)
+        for ref, sha in (refs or {}).items():
+            with open(os.path.join(git_dir, ref), 'w') as f:
+                f.write(sha + '\n')
+        if packed:
+            with open(os.path.join(git_dir, 'packed-refs'), 'w') as f:
+                f.write(packed)
+        self.addCleanup(shutil.rmtree, self.repo_dir)
+        return gs.GitTopicStore({}, "somerepo", self.repo_dir, "")
+
+    def test_head_commit_from_ref(self):
+        store = self._make_git_dir(
+            'ref: refs/heads/master\n', {'refs/heads/master': 'abc123'})
+        self.assertEqual('abc123', store._head_commit())
+
+    def test_head_commit_from_packed_refs(self):
+        store = self._make_git_dir(
+            'ref: refs/heads/master\n',
+            packed='# pack-refs with: peeled\ndef456 refs/heads/master\n')
+        self.assertEqual('def456', store._head_commit())
+
+    def test_head_commit_detached(self):
+        store = self._make_git_dir('abc123\n')
+        self.assertEqual('abc123', store._head_commit())
+
+    def test_head_commit_missing(self):
+        self.assertIsNone(self.store._head_commit())
+
+    @mock.patch('eh.topic_store.TopicStore.initialize')
+    @mock.patch('eh.topic_index.TopicIndex.load')
+    @mock.patch('eh.git_store.GitTopicStore._head_commit')
+    @mock.patch('eh.git_store.GitTopicStore._check_if_directories_exist')
+    def test_initialize_same_head_uses_index(
+            self, mock_exists, mock_head, mock_load, mock_init):
+        mock_exists.return_value = True
+        mock_head.return_value = 'abc'
+        self.store.index.head = 'abc'
+        self.store.index.entries = {
+            'b.md': {'meta': ['b'], 'summary': 'B'},
+            'a/a.md': {'meta': ['a'], 'summary': 'A'},
+        }
+        with mock.patch('eh.topic.Topic.parse_topic_header') as mock_parse:
+            self.store.initialize({})
+            self.assertEqual(0, mock_parse.call_count)
+        self.assertEqual(0, mock_init.call_count)
+        self.assertEqual(['b.md', 'a/a.md'], self.store.topic_paths)
+        self.assertEqual(2, self.store.topic_count())
+
+    @mock.patch('eh.git_store.GitTopicStore._reindex_commits')
+    @mock.patch('eh.topic_store.TopicStore.initialize')
+    @mock.patch('eh.topic_index.TopicIndex.load')
+    @mock.patch('eh.git_store.GitTopicStore._head_commit')
+    @mock.patch('eh.git_store.GitTopicStore._check_if_directories_exist')
+    def test_initialize_moved_head_reindexes_commits(
+            self, mock_exists, mock_head, mock_load, mock_init, mock_reindex):
+        mock_exists.return_value = True
+        mock_head.return_value = 'def'
+        self.store.index.head = 'abc'
+        self.store.initialize({})
+        self.assertEqual(0, mock_init.call_count)
+        mock_reindex.assert_called_once_with({}, 'abc', 'def')
+
+    @mock.patch('eh.topic_store.TopicStore.initialize')
+    @mock.patch('eh.topic_index.TopicIndex.load')
+    @mock.patch('eh.git_store.GitTopicStore._head_commit')
+    @mock.patch('eh.git_store.GitTopicStore._check_if_directories_exist')
+    def test_initialize_without_indexed_head_walks(
+            self, mock_exists, mock_head, mock_load, mock_init):
+        mock_exists.return_value = True
+        mock_head.return_value = 'abc'
+        self.store.initialize({})
+        self.assertEqual(1, mock_init.call_count)
+        self.assertEqual('abc', self.store.index.head)
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('eh.git_store.GitTopicStore._reindex_commits')
+    @mock.patch('eh.git_store.GitTopicStore._head_commit')
+    @mock.patch('git.cmd.Git', create=True)
+    def test_update_reindexes_when_head_moves(
+            self, mock_git, mock_head, mock_reindex, mock_exists):
+        mock_exists.return_value = True
+        mock_head.side_effect = ['abc', 'def']
+        self.store.index.head = 'abc'
+        self.store.update()
+        mock_reindex.assert_called_once_with({}, 'abc', 'def')
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('eh.git_store.GitTopicStore._full_initialize')
+    @mock.patch('eh.git_store.GitTopicStore._reindex_commits')
+    @mock.patch('eh.git_store.GitTopicStore._head_commit')
+    @mock.patch('git.cmd.Git', create=True)
+    def test_update_full_reindex_when_old_commit_is_gone(
+            self, mock_git, mock_head, mock_reindex, mock_full, mock_exists):
+        mock_exists.return_value = True
+        mock_head.side_effect = ['abc', 'def']
+        mock_reindex.side_effect = ValueError('missing commit abc')
+        self.store.index.head = 'abc'
+        self.assertEqual(constants.UPDATE_CHANGED, self.store.update())
+        mock_full.assert_called_once_with({}, 'def')
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('eh.git_store.GitTopicStore._reindex_commits')
+    @mock.patch('eh.git_store.GitTopicStore._head_commit')
+    @mock.patch('git.cmd.Git', create=True)
+    def test_update_no_reindex_when_head_same(
+            self, mock_git, mock_head, mock_reindex, mock_exists):
+        mock_exists.return_value = True
+        mock_head.return_value = 'abc'
+        self.store.index.head = 'abc'
+        self.store.update()
+        self.assertEqual(0, mock_reindex.call_count)
+
+    @mock.patch('eh.git_store.GitTopicStore._init_repo')
+    @mock.patch('eh.git_store.GitTopicStore._check_if_directories_exist')
+    def test_initialize_failed_clone_leaves_store_empty(
+            self, mock_exists, mock_init):
+        mock_exists.return_value = False
+        mock_init.side_effect = exc.GitStoreError("Failed to clone")
+        self.store.initialize({})
+        self.assertEqual(0, self.store.topic_count())
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('git.cmd.Git', create=True)
+    def test_update_pull_failure_raises(self, mock_git, mock_exists):
+        mock_exists.return_value = True
+        mock_git.return_value.pull.side_effect = (
+            git.exc.GitCommandError("pull", "failboat"))
+        with self.assertRaises(exc.GitStoreError):
+            self.store.update()
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('eh.git_store.GitTopicStore._head_commit')
+    @mock.patch('git.cmd.Git', create=True)
+    def test_update_pull_uses_timeout(self, mock_git, mock_head, mock_exists):
+        mock_exists.return_value = True
+        mock_head.return_value = 'abc'
+        self.assertEqual(constants.UPDATE_UNCHANGED, self.store.update())
+        mock_git.return_value.pull.assert_called_once_with(
+            kill_after_timeout=constants.DEFAULT_UPDATE_TIMEOUT)
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('eh.git_store.GitTopicStore._init_repo', create=True)
+    def test_update_reports_clone(self, mock_init, mock_exists):
+        mock_exists.return_value = False
+        self.assertEqual(constants.UPDATE_CLONED, self.store.update())
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('os.makedirs', create=True)
+    @mock.patch('git.Repo.clone_from', create=True)
+    def test_setup_repo_dir_clones_shallow(
+            self, mock_clone, mock_dirs, mock_exists):
+        mock_exists.return_value = True
+        self.store._setup_repo_directory()
+        kwargs = mock_clone.call_args[1]
+        self.assertEqual(constants.CLONE_DEPTH, kwargs['depth'])
+        self.assertNotIn('no_checkout', kwargs)
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('os.makedirs', create=True)
+    @mock.patch('git.Repo.clone_from', create=True)
+    def test_setup_repo_dir_full_clone_if_disabled(
+            self, mock_clone, mock_dirs, mock_exists):
+        mock_exists.return_value = True
+        conf = {'eh': {'shallow_clone': 'false'}}
+        store = gs.GitTopicStore(conf, "somerepo", "", "")
+        store._setup_repo_directory()
+        self.assertNotIn('depth', mock_clone.call_args[1])
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('os.makedirs', create=True)
+    @mock.patch('eh.git_store.GitTopicStore._apply_sparse_checkout')
+    @mock.patch('git.Repo.clone_from', create=True)
+    def test_setup_repo_dir_sparse_if_selected(
+            self, mock_clone, mock_sparse, mock_dirs, mock_exists):
+        mock_exists.return_value = True
+        conf = {'store': {'topics': 'eh/about'}}
+        store = gs.GitTopicStore(conf, "somerepo", "", "store")
+        store._setup_repo_directory()
+        self.assertTrue(mock_clone.call_args[1]['no_checkout'])
+        self.assertEqual(1, mock_sparse.call_count)
+
+    def test_sparse_patterns(self):
+        self.assertEqual([], self.store._sparse_patterns())
+        key = os.path.join('eh', 'about')
+        conf = {'store': {'topics': '%s, help' % key}}
+        store = gs.GitTopicStore(conf, "somerepo", "", "store")
+        self.assertEqual(
+            ['/eh/about.md', '/help.md'], store._sparse_patterns())
+
+    @mock.patch('git.cmd.Git', create=True)
+    def test_apply_sparse_checkout(self, mock_git):
+        conf = {'store': {'topics': 'help'}}
+        repo_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, repo_dir)
+        store = gs.GitTopicStore(conf, "somerepo", repo_dir, "store")
+        store._apply_sparse_checkout()
+        self.assertEqual(['/help.md'], store._current_sparse_patterns())
+        mock_git.return_value.read_tree.assert_called_once_with('-mu', 'HEAD')
+        store._selected_topics = []
+        store._apply_sparse_checkout()
+        self.assertEqual([], store._current_sparse_patterns())
+        mock_git.return_value.config.assert_called_with(
+            'core.sparseCheckout', 'false')
+
+    @mock.patch('eh.git_store.GitTopicStore._full_initialize')
+    @mock.patch('eh.git_store.GitTopicStore._apply_sparse_checkout')
+    @mock.patch('eh.git_store.GitTopicStore._current_sparse_patterns')
+    @mock.patch('eh.git_store.GitTopicStore._check_if_directories_exist')
+    def test_initialize_applies_changed_selection(
+            self, mock_exists, mock_current, mock_sparse, mock_full):
+        mock_exists.return_value = True
+        mock_current.return_value = ['/help.md']
+        self.store.initialize({})
+        self.assertEqual(1, mock_sparse.call_count)
+        mock_sparse.reset_mock()
+        mock_current.return_value = []
+        self.store.initialize({})
+        self.assertEqual(0, mock_sparse.call_count)
+
+    @mock.patch('os.path.exists', create=True)
+    @mock.patch('eh.git_store.GitTopicStore._head_commit')
+    @mock.patch('git.cmd.Git', create=True)
+    def test_update_shallow_fetches_and_resets(
+            self, mock_git, mock_head, mock_exists):
+        mock_exists.return_value = True
+        mock_head.return_value = 'abc'
+        self.mock_shallow.return_value = True
+        self.store.update()
+        g = mock_git.return_value
+        g.fetch.assert_called_once_with(
+            '--depth=%d' % constants.CLONE_DEPTH,
+            kill_after_timeout=constants.DEFAULT_UPDATE_TIMEOUT)
+        g.reset.assert_called_once_with('--hard', 'FETCH_HEAD')
+        self.assertEqual(0, g.pull.call_count)
@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+
+from eh import pager
+from eh.tests import base_test as base
+
+
+class TestPager(base.TestCase):
+    def setUp(self):
+        super(TestPager, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'out')
+
+    def tearDown(self):
+        super(TestPager, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_messages_are_written_to_the_pager(self):
+        p = pager.Pager('cat > %s' % self.path)
+        p.echo('one')
+        p.echo(u'two ✓')
+        p.close()
+        with open(self.path, 'rb') as f:
+            self.assertEqual(u'one\ntwo ✓\n', f.read().decode('utf-8'))
+
+    def test_pager_not_started_without_messages(self):
+        p = pager.Pager('cat > %s' % self.path)
+        p.close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_quit_pager_drops_messages(self):
+        p = pager.Pager('true')
+        for i in range(1000):
+            p.echo('x' * 1000)
+        p.close()
+        self.assertTrue(p._closed)
@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+
+from eh import constants
+from eh import query_cache as qc
+from eh.tests import base_test as base
+
+
+class TestQueryCache(base.TestCase):
+    def setUp(self):
+        super(TestQueryCache, self).setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.patch1 = mock.patch('eh.constants.CACHE_DIR', self.cache_dir)
+        self.patch1.start()
+        self.cache = qc.QueryCache('test_store', 'v1', 2)
+
+    def tearDown(self):
+        super(TestQueryCache, self).tearDown()
+        mock.patch.stopall()
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_missing_returns_none(self):
+        self.assertIsNone(self.cache.get('git', 35))
+
+    def test_put_then_get(self):
+        self.cache.put('git', 35, [(90.5, 'git/commit')])
+        self.assertEqual([[90.5, 'git/commit']], self.cache.get('git', 35))
+        self.assertIsNone(self.cache.get('git', 50))
+
+    def test_parent_is_part_of_the_key(self):
+        self.cache.put('git/br', 35, [(80, 'git/branch')], 'git')
+        self.assertIsNone(self.cache.get('git/br', 35))
+        self.assertEqual(
+            [[80, 'git/branch']], self.cache.get('git/br', 35, 'git'))
+
+    def test_lru_eviction(self):
+        self.cache.put('a', 35, [])
+        self.cache.put('b', 35, [])
+        self.cache.get('a', 35)
+        self.cache.put('c', 35, [])
+        self.assertEqual([], self.cache.get('a', 35))
+        self.assertIsNone(self.cache.get('b', 35))
+        self.assertEqual([], self.cache.get('c', 35))
+
+    def test_save_and_load_round_trip(self):
+        self.cache.put('a', 35, [(40.1, 'x')])
+        self.cache.put('b', 35, [])
+        self.cache.get('a', 35)
+        self.cache.save()
+        self.assertFalse(self.cache.dirty)
+        cache = qc.QueryCache('test_store', 'v1', 2)
+        cache.load()
+        self.assertEqual(
+            [qc.QueryCache.make_key('b', 35), qc.QueryCache.make_key('a', 35)],
+            list(cache.entries.keys()))
+        self.assertEqual([[40.1, 'x']], cache.get('a', 35))
+
+    def test_hit_does_not_dirty(self):
+        self.cache.put('a', 35, [])
+        self.cache.put('b', 35, [])
+        self.cache.save()
+        self.assertEqual([], self.cache.get('a', 35))
+        self.assertFalse(self.cache.dirty)
+
+    def test_load_drops_other_store_version(self):
+        self.cache.put('a', 35, [])
+        self.cache.save()
+        cache = qc.QueryCache('test_store', 'v2', 2)
+        cache.load()
+        self.assertIsNone(cache.get('a', 35))
+        other = qc.QueryCache('other_store', 'v2', 2)
+        other.load()
+        self.assertEqual({}, other.entries)
+
+    def test_load_ignores_old_version(self):
+        with open(self.cache.path, 'w') as f:
+            json.dump({
+                'version': constants.QUERY_CACHE_VERSION - 1,
+                'store': 'v1',
+                'entries': {qc.QueryCache.make_key('a', 35): []}}, f)
+        self.cache.load()
+        self.assertIsNone(self.cache.get('a', 35))
+
+    def test_disabled_with_size_zero(self):
+        cache = qc.QueryCache('test_store', 'v1', 0)
+        cache.put('a', 35, [])
+        cache.save()
+        self.assertIsNone(cache.get('a', 35))
+        self.assertFalse(os.path.exists(cache.path))
@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+
+import mock
+
+from eh import output
+from eh import render_cache as rc
+from eh.tests import base_test as base
+
+
+class TestRenderCache(base.TestCase):
+    def setUp(self):
+        super(TestRenderCache, self).setUp()
+        self.render_dir = tempfile.mkdtemp()
+        self.patch1 = mock.patch('eh.constants.RENDER_DIR', self.render_dir)
+        self.patch1.start()
+        self.cache = rc.RenderCache(100)
+
+    def tearDown(self):
+        super(TestRenderCache, self).tearDown()
+        mock.patch.stopall()
+        shutil.rmtree(self.render_dir)
+
+    def test_make_key_depends_on_everything(self):
+        key = rc.RenderCache.make_key('# Text', False, 80, 'theme')
+        self.assertEqual(
+            key, rc.RenderCache.make_key('# Text', False, 80, 'theme'))
+        for other in [
+                ('# Other', False, 80, 'theme'),
+                ('# Text', True, 80, 'theme'),
+                ('# Text', False, 100, 'theme'),
+                ('# Text', False, 80, 'other')]:
+            self.assertNotEqual(key, rc.RenderCache.make_key(*other))
+
+    def _put(self, cache, key, rendered):
+        self.assertEqual([rendered], list(cache.store(key, [rendered])))
+
+    def test_store_then_get(self):
+        self.assertIsNone(self.cache.get('abc'))
+        self._put(self.cache, 'abc', u'rendered ✓')
+        self.assertEqual(u'rendered ✓', self.cache.get('abc'))
+
+    def test_disabled(self):
+        cache = rc.RenderCache(0)
+        self._put(cache, 'abc', 'rendered')
+        self.assertIsNone(cache.get('abc'))
+        self.assertEqual([], os.listdir(self.render_dir))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.size = 130
+        for i, key in enumerate(['a', 'b', 'c']):
+            self._put(self.cache, key, 'x' * 40)
+            os.utime(rc.RenderCache.path(key), ns=(i, i))
+        self.cache.get('a')
+        self._put(self.cache, 'd', 'x' * 40)
+        self.assertEqual(
+            ['a.txt', 'c.txt', 'd.txt'], sorted(os.listdir(self.render_dir)))
+
+    def test_terminal_columns(self):
+        with mock.patch.dict(os.environ, {'width': '120', 'COLUMNS': '90'}):
+            self.assertEqual(120, rc.terminal_columns())
+        with mock.patch.dict(os.environ, {'COLUMNS': '90'}):
+            os.environ.pop('width', None)
+            self.assertEqual(90, rc.terminal_columns())
+
+    def test_output_topic_uses_cache(self):
+        topic = mock.Mock()
+        topic.text = '# Title\n\nBody'
+        topic.rootpath = '/store'
+        out = output.MarkdownOutput({})
+        out.no_colors = True
+        with mock.patch('mdv.main', return_value='Title\n\n Body\n') as main:
+            self.assertEqual('Title\n Body', out.output_topic(topic))
+            self.assertEqual('Title\n Body', out.output_topic(topic))
+            out.no_colors = False
+            out.output_topic(topic)
+        self.assertEqual(2, main.call_count)
+
+    def test_split_blocks(self):
+        text = '\n'.join([
+            '# One', 'a', 'b', '```', '# not a heading', 'c', '```', '# Two',
+            'd', '', 'e'])
+        self.assertEqual([text], list(rc.split_blocks(text, 100)))
+        self.assertEqual(
+            ['# One\na\nb\n```\n# not a heading\nc\n```',
+             '# Two\nd\n\ne'],
+            list(rc.split_blocks(text, 2)))
+        self.assertEqual(text, '\n'.join(rc.split_blocks(text, 1)))
+
+    @mock.patch('eh.render_cache._stream_theme', return_value=None)
+    def test_render_blocks(self, theme):
+        with mock.patch(
+                'mdv.main',
+                side_effect=lambda md, **kw: '\n%s\n \n' % md.upper()):
+            with mock.patch('eh.constants.STREAM_BLOCK_LINES', 1):
+                self.assertEqual(
+                    ['# ONE\nA', '# TWO'],
+                    list(rc.render_blocks('# One\na\n# Two', True, 80)))
+        self.assertEqual([], list(rc.render_blocks(None, True, 80)))
+
+    def test_link_definitions(self):
+        text = '\n'.join([
+            '[a]: http://a.example', '```', '[b]: http://b.example', '```',
+            '  [c]: http://c.example "C"', 'text [d] here'])
+        self.assertEqual(
+            ['[a]: http://a.example', '  [c]: http://c.example "C"'],
+            rc.link_definitions(text))
+
+    def test_render_blocks_keeps_distant_link_definitions(self):
+        import mdv
+        text = '# Top\nSee [the docs][d].\n\n%s\n[d]: http://d.example\n' % (
+            '\n'.join('# S%d\nline %d\n' % (i, i) for i in range(60)))
+        blocks = list(rc.render_blocks(text, True, 80))
+        self.assertGreater(len(blocks), 1)
+        self.assertNotIn('[the docs][d]', blocks[0])
+        self.assertIn('http://d.example', blocks[0])
+        whole = mdv.main(text, no_colors=True, cols=80, c_theme='default')
+        self.assertEqual(
+            '\n'.join(line for line in whole.splitlines() if line.strip()),
+            '\n'.join(blocks))
+
+    def test_store_writes_blocks_as_they_pass(self):
+        blocks = self.cache.store('abc', iter(['one', 'two']))
+        self.assertEqual('one', next(blocks))
+        self.assertIsNone(self.cache.get('abc'))
+        self.assertEqual(['two'], list(blocks))
+        self.assertEqual('one\ntwo', self.cache.get('abc'))
+
+    def test_store_drops_unfinished_rendering(self):
+        blocks = self.cache.store('abc', iter(['one', 'two']))
+        next(blocks)
+        blocks.close()
+        self.assertIsNone(self.cache.get('abc'))
+        self.assertEqual([], os.listdir(self.render_dir))
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+
+import mock
+
+from eh import output
+from eh import render_cache as rc
+from eh import render_pack as rp
+from eh.tests import base_test as base
+
+
+class SerialPool(object):
+    def map(self, fn, *iterables):
+        return list(map(fn, *iterables))
+
+
+class TestRenderPack(base.TestCase):
+    def setUp(self):
+        super(TestRenderPack, self).setUp()
+        self.render_dir = tempfile.mkdtemp()
+        self.patch1 = mock.patch('eh.constants.RENDER_DIR', self.render_dir)
+        self.patch1.start()
+        self.pack = rp.RenderPack('/store/')
+
+    def tearDown(self):
+        super(TestRenderPack, self).tearDown()
+        mock.patch.stopall()
+        shutil.rmtree(self.render_dir)
+
+    def _store(self, *texts):
+        store = mock.Mock()
+        store.name = 'test_store'
+        store.filepath = '/store/'
+        topics = []
+        for text in texts:
+            t = mock.Mock()
+            t.text = text
+            topics.append(t)
+        store.get_all_topics.return_value = topics
+        return store
+
+    def test_pack_path_per_store(self):
+        self.assertNotEqual(
+            self.pack.path, rp.RenderPack('/other/').path)
+        self.assertEqual(self.render_dir, os.path.dirname(self.pack.path))
+
+    def test_write_then_get(self):
+        self.pack.write('test_store', {'a': u'first ✓', 'b': 'second'})
+        pack = rp.RenderPack('/store/')
+        self.assertEqual(u'first ✓', pack.get('a'))
+        self.assertEqual('second', pack.get('b'))
+        self.assertIsNone(pack.get('c'))
+
+    def test_missing_or_other_pack_is_empty(self):
+        self.assertIsNone(self.pack.get('a'))
+        self.pack.write('test_store', {'a': 'first'})
+        with open(self.pack.path, 'rb') as f:
+            data = f.read()
+        other = rp.RenderPack('/other/')
+        with open(other.path, 'wb') as f:
+            f.write(data)
+        self.assertIsNone(other.get('a'))
+
+    @mock.patch('eh.render_cache.render')
+    def test_build_only_renders_changed_topics(self, render):
+        render.side_effect = (
+            lambda text, no_colors, cols: '%s %s' % (text, no_colors))
+        store = self._store('one', 'two', None)
+        self.assertEqual((4, 0), rp.build(store, 80, 'theme', SerialPool()))
+        store = self._store('one', 'three')
+        self.assertEqual((2, 2), rp.build(store, 80, 'theme', SerialPool()))
+        self.assertEqual(6, render.call_count)
+        key = rc.RenderCache.make_key('three', True, 80, 'theme')
+        self.assertEqual('three True', rp.RenderPack('/store/').get(key))
+        key = rc.RenderCache.make_key('two', True, 80, 'theme')
+        self.assertIsNone(rp.RenderPack('/store/').get(key))
+
+    def test_output_topic_uses_pack(self):
+        topic = mock.Mock()
+        topic.text = '# Title'
+        topic.rootpath = '/store/'
+        key = rc.RenderCache.make_key(
+            topic.text, True, rc.terminal_columns(), rc.theme())
+        self.pack.write('test_store', {key: 'Packed title'})
+        out = output.MarkdownOutput({})
+        out.no_colors = True
+        with mock.patch('eh.render_cache.render') as render:
+            self.assertEqual('Packed title', out.output_topic(topic))
+        self.assertEqual(0, render.call_count)
@@ -0,0 +1,63 @@
+import os
+
+from fuzzywuzzy import fuzz
+import mock
+
+from eh import scorer
+from eh.tests import base_test as base
+from eh.tests import test_search_index as tsi
+from eh import topic_key as tk
+
+
+class TestScoreTable(base.TestCase):
+    def setUp(self):
+        super(TestScoreTable, self).setUp()
+        self.topics = [
+            tsi.FakeTopic(
+                os.path.join('git', 'commit.md'), ['git', 'vcs'],
+                'Record changes to the repository'),
+            tsi.FakeTopic(
+                os.path.join('docker', 'run.md'), ['containers'],
+                'Run a command in a new container'),
+            tsi.FakeTopic('ls.md', [], None),
+            tsi.FakeTopic('tag.md', ['tag', 'git'], 'tag'),
+        ]
+        self.table = scorer.ScoreTable(self.topics)
+
+    def test_columns(self):
+        self.assertEqual(4, len(self.table))
+        self.assertEqual(os.path.join('git', 'commit'), self.table.keys[0])
+        self.assertEqual('commit', self.table.shortkeys[0])
+        self.assertEqual('git,vcs', self.table.metas[0])
+        self.assertEqual(set(['git', 'vcs']), self.table.meta_tokens[0])
+        self.assertIsNone(self.table.summary_tokens[2])
+
+    def test_scores_match_topic_key(self):
+        lookups = [
+            'git', 'commit', os.path.join('git', 'commit'), 'ls', 'rnu',
+            'container run', 'git,vcs', 'tag', 'Record changes', '', '!!']
+        for lookup in lookups:
+            expected = [
+                tk.TopicKey.get_key_metascore(t.key, lookup, t.summary)
+                for t in self.topics]
+            self.assertEqual(expected, self.table.scores(lookup))
+
+    def test_scores_for_positions(self):
+        scores = self.table.scores('ls', [2, 0])
+        self.assertEqual(2, len(scores))
+        self.assertEqual(100, scores[0])
+
+    def test_token_set_ratio_matches_fuzz(self):
+        pairs = [
+            ('git commit', 'Record changes to the repository'),
+            ('run container', 'Run a command in a new container'),
+            ('a b', 'b a'), ('x', ''), ('', '')]
+        for s1, s2 in pairs:
+            self.assertEqual(
+                fuzz.token_set_ratio(s1, s2),
+                self.table._token_set_ratio(
+                    self.table.tokenize(s1), self.table.tokenize(s2)))
+
+    def test_ratio_function_falls_back_to_fuzz(self):
+        with mock.patch.dict('sys.modules', {'Levenshtein': None}):
+            self.assertIs(fuzz.ratio, scorer.ScoreTable.ratio_function())
@@ -0,0 +1,103 @@
+import os
+
+from eh import search_index as si
+from eh.tests import base_test as base
+from eh import topic_key as tk
+
+
+class FakeTopic(object):
+    def __init__(self, path, meta, summary):
+        self.path = path
+        self.key = tk.TopicKey({}, path, meta)
+        self.summary = summary
+
+    def meta_match(self, meta_string):
+        return self.key.metascore(meta_string, self.summary)
+
+
+class TestSearchIndex(base.TestCase):
+    def setUp(self):
+        super(TestSearchIndex, self).setUp()
+        self.topics = [
+            FakeTopic(
+                os.path.join('git', 'commit.md'), ['git', 'vcs'],
+                'Record changes to the repository'),
+            FakeTopic(
+                os.path.join('git', 'push.md'), ['git'],
+                'Update remote refs'),
+            FakeTopic(
+                os.path.join('docker', 'run.md'), ['containers'],
+                'Run a command in a new container'),
+            FakeTopic('ls.md', [], None),
+            FakeTopic('zz.md', ['sleep'], 'Nothing to see'),
+        ]
+        self.index = si.SearchIndex(self.topics)
+
+    def _scored(self, lookup, min_score):
+        return [
+            (t.meta_match(lookup), t.path) for t in self.topics
+            if t.meta_match(lookup) > min_score]
+
+    def test_index_grams_and_tokens(self):
+        self.assertEqual(5, len(self.index))
+        self.assertEqual(set([0]), self.index.grams['com'])
+        self.assertEqual(set([0, 1]), self.index.tokens['git'])
+        self.assertEqual(set([0]), self.index.tokens['repository'])
+        self.assertNotIn('Record', self.index.tokens)
+
+    def test_make_grams(self):
+        self.assertEqual(
+            set(['abc', 'bcd']), si.SearchIndex.make_grams('abcd'))
+        self.assertEqual(set(), si.SearchIndex.make_grams('ab'))
+
+    def test_candidates_keep_index_order(self):
+        positions = self.index.candidate_positions('git', 0)
+        self.assertEqual(sorted(positions), positions)
+
+    def test_candidates_prune_unrelated_topics(self):
+        positions = self.index.candidate_positions('docker', 35)
+        self.assertIn(2, positions)
+        self.assertNotIn(0, positions)
+        self.assertNotIn(4, positions)
+
+    def test_candidates_keep_short_exact_key(self):
+        self.assertIn(3, self.index.candidate_positions('ls', 35))
+
+    def test_subtree(self):
+        self.assertEqual([0, 1], self.index.subtree('git'))
+        self.assertEqual([], self.index.subtree('ls'))
+        lookup = os.path.join('git', 'com')
+        self.assertEqual(
+            [0, 1], self.index.candidate_positions(lookup, 0, 'git'))
+        self.assertEqual(
+            [0, 1], sorted(
+                self.topics.index(t) for s, t in
+                self.index.search(lookup, 0, 'git')))
+
+    def test_bound_is_never_below_score(self):
+        lookups = [
+            'git', 'commit', os.path.join('git', 'comit'), 'ls', 'dokcer',
+            'run container', 'zz', 'Nothing to see', 'git,vcs', 'q', '']
+        for lookup in lookups:
+            tokens = self.index.table.tokenize(lookup.replace(os.sep, ' '))
+            chars = si.SearchIndex._chars(lookup)
+            token_chars = si.SearchIndex._token_chars(tokens)
+            for position, t in enumerate(self.topics):
+                if tokens & self.index.table.tokenize(
+                        ' '.join(t.key.meta) + ' ' + (t.summary or '')):
+                    continue
+                self.assertGreaterEqual(
+                    self.index.bound(position, lookup, chars, token_chars),
+                    t.meta_match(lookup))
+
+    def test_results_unchanged(self):
+        lookups = [
+            'git', 'commit', os.path.join('git', 'push'), 'ls', 'rnu',
+            'container run', 'sleep', 'Nothing to see', 'xyz']
+        for lookup in lookups:
+            for min_score in [0, 35, 50]:
+                pruned = [
+                    (score, t.path)
+                    for score, t in self.index.search(lookup, min_score)
+                    if score > min_score]
+                self.assertEqual(self._scored(lookup, min_score), pruned)
@@ -0,0 +1,60 @@
+from eh import table
+from eh.tests import base_test as base
+
+
+class TestTable(base.TestCase):
+    def setUp(self):
+        super(TestTable, self).setUp()
+        self.table = table.Table(['Repo', 'Key', 'Summary'])
+        self.table.add_row(['eh_subjects', 'git/commit', 'Commit things'])
+        self.table.add_row(['x', 'a', None])
+
+    def test_columns(self):
+        self.assertEqual(
+            ' Repo        Key        Summary       \n'
+            ' eh_subjects git/commit Commit things \n'
+            ' x           a          None          ',
+            str(self.table))
+        self.assertEqual(2, len(self.table))
+
+    def test_no_rows(self):
+        self.assertEqual(' Repo ', str(table.Table(['Repo'])))
+
+    def test_lines(self):
+        self.assertEqual(
+            ' x           a          None          ',
+            list(self.table.lines())[2])
+
+    def test_multiline_cell(self):
+        t = table.Table(['Key', 'Summary'])
+        t.add_row(['a', 'one\ntwo'])
+        self.assertEqual(
+            ' Key Summary \n a   one     \n     two     ', str(t))
+
+    def test_wide_characters(self):
+        t = table.Table(['Key', 'Summary'])
+        t.add_row(['日本', 'x'])
+        t.add_row(['ab', 'y'])
+        self.assertEqual(
+            ' Key  Summary \n 日本 x       \n ab   y       ', str(t))
+
+    def test_truncate_last_column(self):
+        self.table.width = 34
+        lines = list(self.table.lines())
+        self.assertEqual(' eh_subjects git/commit Commit t… ', lines[1])
+        self.assertEqual(' Repo        Key        Summary   ', lines[0])
+        for line in lines:
+            self.assertLessEqual(len(line), 34)
+
+    def test_no_truncate_when_it_fits(self):
+        self.table.width = 80
+        self.assertEqual(
+            ' eh_subjects git/commit Commit things ',
+            list(self.table.lines())[1])
+
+    def test_truncate(self):
+        self.assertEqual('abc', table.truncate('abc', 3))
+        self.assertEqual('ab…', table.truncate('abcd', 3))
+        self.assertEqual('日…', table.truncate('日本語', 4))
+        self.assertEqual(4, table.display_width('日本'))
+        self.assertEqual(1, table.display_width('é'))
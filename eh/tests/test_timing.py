@@ -0,0 +1,46 @@
+import json
+
+import mock
+
+from eh import timing
+from eh.tests import base_test as base
+
+
+class TestTimings(base.TestCase):
+    def setUp(self):
+        super(TestTimings, self).setUp()
+        self.timings = timing.Timings()
+
+    def test_phases_add_up_in_order(self):
+        self.timings.add('walk', 0.002)
+        self.timings.add('parse', 0.001)
+        self.timings.add('walk', 0.003)
+        self.assertEqual(
+            [('walk', 5.0), ('parse', 1.0)], self.timings.milliseconds())
+
+    def test_phase_records_on_error(self):
+        with mock.patch('time.perf_counter', side_effect=[1.0, 1.5]):
+            with self.assertRaises(ValueError):
+                with self.timings.phase('search'):
+                    raise ValueError()
+        self.assertEqual([('search', 500.0)], self.timings.milliseconds())
+
+    def test_to_json(self):
+        self.timings.add('config', 0.001)
+        self.timings.add('render', 0.0025)
+        data = json.loads(self.timings.to_json())
+        self.assertEqual('ms', data['unit'])
+        self.assertEqual(['config', 'render'], list(data['phases']))
+        self.assertEqual(3.5, data['total'])
+
+    def test_reset(self):
+        self.timings.add('config', 1)
+        self.timings.reset()
+        self.assertEqual([], self.timings.milliseconds())
+
+    def test_module_phase_uses_global_timings(self):
+        timing.TIMINGS.reset()
+        with timing.phase('search'):
+            pass
+        self.assertEqual(['search'], list(timing.TIMINGS.phases))
+        timing.TIMINGS.reset()
@@ -280,3 +280,76 @@ Lorem ipsum something dolar emet. Yup.
             data = cheatsheet_missing_title.split("\n")
             top.Topic.determine_format(data)
 
+    def test_header_defers_reading_text(self):
+        self.open_mock.reset_mock()
+        topic = top.Topic(
+            self.conf, {}, self.rootpath, self.path,
+            header=(['cached'], 'Cached summary'))
+        self.assertEqual(['cached'], topic.meta)
+        self.assertEqual('Cached summary', topic.summary)
+        self.assertEqual(0, self.open_mock.call_count)
+        text_without_top_line = "\n".join(self.good_data.splitlines()[1:])
+        self.assertEqual(text_without_top_line, topic.text)
+        self.assertEqual(1, self.open_mock.call_count)
+
+    def test_lazy_reads_only_preamble(self):
+        topic = top.Topic(
+            self.conf, {}, self.rootpath, self.path, lazy=True)
+        self.assertEqual(['testing'], topic.meta)
+        self.assertEqual('This is test contents', topic.summary)
+        self.assertIsNone(topic._text)
+        text_without_top_line = "\n".join(self.good_data.splitlines()[1:])
+        self.assertEqual(text_without_top_line, topic.text)
+
+    def test_read_topic_header(self):
+        data = cheatsheet_header + "\n# Body\n\nLots of text\n"
+        with mock.patch(
+                'eh.topic.open', mock.mock_open(read_data=data)):
+            header = top.Topic.read_topic_header(self.rootpath, self.path)
+        self.assertEqual(cheatsheet_header.split("\n"), header)
+        header = top.Topic.read_topic_header(self.rootpath, self.path)
+        self.assertEqual([self.good_data.splitlines()[0]], header)
+
+    def test_parse_topic_header_cheatsheet(self):
+        data = cheatsheet_header + "\n# Body\n"
+        with mock.patch(
+                'eh.topic.open', mock.mock_open(read_data=data)):
+            meta, summary = top.Topic.parse_topic_header(
+                self.conf, self.root_node, self.rootpath, self.path)
+        self.assertEqual(['WIP', 'Featured', "React"], meta)
+        self.assertEqual(
+            "This is some *Markdown* at the beginning of the article.",
+            summary.strip())
+
+    def test_parse_topic_header_invalid_preamble_raises(self):
+        with mock.patch(
+                'eh.topic.open',
+                mock.mock_open(read_data="no preamble\n")):
+            with self.assertRaises(exc.TopicError):
+                top.Topic.parse_topic_header(
+                    self.conf, self.root_node, self.rootpath, self.path)
+
+    def test_read_topic_text_cheatsheet(self):
+        data = cheatsheet_header + "\n# Body\n\nLots of text\n"
+        with mock.patch(
+                'eh.topic.open', mock.mock_open(read_data=data)):
+            text = top.Topic.read_topic_text(self.rootpath, self.path)
+        self.assertEqual("# Body\n\nLots of text", text)
+
+    def test_unmap_topic_path_from_root_node(self):
+        root = {}
+        top.Topic.map_topic_path_to_root_node({}, root, 'a/b/one.md', 'one')
+        top.Topic.map_topic_path_to_root_node({}, root, 'a/two.md', 'two')
+        top.Topic.unmap_topic_path_from_root_node(
+            {}, root, 'a/b/one.md', 'one')
+        self.assertEqual(
+            {constants.PARENT_KEY: {'a': root['a']},
+             'a': {constants.TOPIC_KEY: ['two']}}, root)
+        top.Topic.unmap_topic_path_from_root_node({}, root, 'a/two.md', 'two')
+        self.assertEqual({constants.PARENT_KEY: {}}, root)
+
+    def test_unmap_unknown_path_is_noop(self):
+        root = {}
+        top.Topic.map_topic_path_to_root_node({}, root, 'a/one.md', 'one')
+        top.Topic.unmap_topic_path_from_root_node({}, root, 'b/x.md', 'x')
+        self.assertEqual(['one'], root['a'][constants.TOPIC_KEY])
@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+
+from eh import constants
+from eh.tests import base_test as base
+from eh import topic_index as ti
+
+
+class TestTopicIndex(base.TestCase):
+    def setUp(self):
+        super(TestTopicIndex, self).setUp()
+        self.index_dir = tempfile.mkdtemp()
+        self.patch1 = mock.patch('eh.constants.INDEX_DIR', self.index_dir)
+        self.patch1.start()
+        self.index = ti.TopicIndex('test_store', '/some/store/')
+        self.stat = (1000, 10)
+
+    def tearDown(self):
+        super(TestTopicIndex, self).tearDown()
+        mock.patch.stopall()
+        shutil.rmtree(self.index_dir)
+
+    def test_lookup_missing_returns_none(self):
+        self.assertIsNone(self.index.lookup('topic.md', self.stat))
+
+    def test_record_then_lookup(self):
+        self.index.record('topic.md', self.stat, ['tag'], 'Summary')
+        self.assertTrue(self.index.dirty)
+        self.assertEqual(
+            (['tag'], 'Summary'), self.index.lookup('topic.md', self.stat))
+
+    def test_lookup_stale_stat_returns_none(self):
+        self.index.record('topic.md', self.stat, ['tag'], 'Summary')
+        self.assertIsNone(self.index.lookup('topic.md', (1001, 10)))
+        self.assertIsNone(self.index.lookup('topic.md', (1000, 11)))
+        self.assertIsNone(self.index.lookup('topic.md', None))
+
+    def test_record_ignores_unparsed_topics(self):
+        self.index.record('topic.md', self.stat, None, None)
+        self.index.record('other.md', None, ['tag'], 'Summary')
+        self.assertEqual({}, self.index.entries)
+        self.assertFalse(self.index.dirty)
+
+    def test_save_and_load_round_trip(self):
+        self.index.record('topic.md', self.stat, ['tag'], 'Summary')
+        self.index.save()
+        self.assertFalse(self.index.dirty)
+        index = ti.TopicIndex('test_store', '/some/store/')
+        index.load()
+        self.assertEqual(
+            (['tag'], 'Summary'), index.lookup('topic.md', self.stat))
+
+    def test_save_skipped_when_clean(self):
+        self.index.save()
+        self.assertFalse(os.path.exists(self.index.path))
+
+    def test_load_ignores_other_filepath(self):
+        self.index.record('topic.md', self.stat, ['tag'], 'Summary')
+        self.index.save()
+        index = ti.TopicIndex('test_store', '/moved/store/')
+        index.load()
+        self.assertEqual({}, index.entries)
+
+    def test_load_ignores_old_version(self):
+        with open(self.index.path, 'w') as f:
+            json.dump({
+                'version': constants.INDEX_VERSION - 1,
+                'filepath': '/some/store/',
+                'topics': {'topic.md': {}}}, f)
+        self.index.load()
+        self.assertEqual({}, self.index.entries)
+
+    def test_load_ignores_garbage(self):
+        with open(self.index.path, 'w') as f:
+            f.write('not json')
+        self.index.load()
+        self.assertEqual({}, self.index.entries)
+
+    def test_prune(self):
+        self.index.record('a.md', self.stat, ['tag'], 'Summary')
+        self.index.record('b.md', self.stat, ['tag'], 'Summary')
+        self.index.dirty = False
+        self.index.prune(['a.md'])
+        self.assertEqual(['a.md'], list(self.index.entries.keys()))
+        self.assertTrue(self.index.dirty)
+
+    def test_stat_file_missing_returns_none(self):
+        self.assertIsNone(ti.TopicIndex.stat_file(self.index_dir, 'nope.md'))
+        self.assertIsNone(ti.TopicIndex.stat_file(None, 'nope.md'))
+
+    def test_stat_file(self):
+        with open(os.path.join(self.index_dir, 'topic.md'), 'w') as f:
+            f.write('12345')
+        stat = ti.TopicIndex.stat_file(self.index_dir, 'topic.md')
+        self.assertEqual(5, stat[1])
+
+    def test_digest_follows_entries(self):
+        empty = self.index.digest()
+        self.index.record('topic.md', self.stat, ['tag'], 'Summary')
+        digest = self.index.digest()
+        self.assertNotEqual(empty, digest)
+        self.index.record('topic.md', (1001, 10), ['tag'], 'Summary')
+        self.assertNotEqual(digest, self.index.digest())
+        self.index.remove('topic.md')
+        self.assertEqual(empty, self.index.digest())
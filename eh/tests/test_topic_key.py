@@ -84,3 +84,16 @@ class TestTopicKey(base.TestCase):
         print(kr, sr, mr, sumr)
         self.assertEqual(kr, max([kr, sr, mr, sumr]))
         self.assertTrue(kr > sr and sr > mr and mr > sumr)
+
+    def test_get_key_metascores_make_metascore(self):
+        key = tk.TopicKey(self.conf, "parent/foo", ["parent", "foo"])
+        for lookup in ["foo", "parent", "fo", "parent/foo", "bar"]:
+            short, full, meta, summary = key.metascores(lookup, "A foo")
+            expected = (
+                short * constants.SHORTKEY_WEIGHT +
+                full * constants.KEY_WEIGHT +
+                meta * constants.META_WEIGHT +
+                summary * constants.SUMMARY_WEIGHT)
+            if full == constants.MATCH:
+                expected = constants.MATCH
+            self.assertEqual(expected, key.metascore(lookup, "A foo"))
@@ -1,6 +1,13 @@
+import os
+import shutil
+import tempfile
+import time
+
 from ConfigObject import ConfigObject
 import mock
 
+from eh import constants
+from eh import exceptions as exc
 from eh.tests import base_test as base
 from eh import topic_manager as tm
 from eh import topic_store as ts
@@ -21,6 +28,10 @@ class StoreMock(mock.Mock):
             return self.topic_name
         return None
 
+    @property
+    def key_map(self):
+        return {'pass': self.topic_name}
+
     def has_parent(self, parent):
         if parent == 'pass':
             return True
@@ -137,3 +148,253 @@ class TestTopicManager(base.TestCase):
         ret, pret = manager.get_root_list()
         self.assertEqual(0, len(ret))
         self.assertEqual(0, len(pret))
+
+    def test_gather_topics_keeps_configured_order(self):
+        conf = ConfigObject()
+        conf['eh'] = {'workers': '4'}
+        conf['topic_stores'] = dict(
+            ('store%d' % i, 'some/directory%d' % i) for i in range(8))
+        with mock.patch('eh.topic_store.TopicStore') as mock_store:
+            mock_store.side_effect = (
+                lambda conf, location, name: mock.Mock(name=name))
+            manager = tm.TopicManager(conf)
+        self.assertEqual(8, len(manager._topic_stores))
+        for i, store in enumerate(manager._topic_stores):
+            self.assertEqual(1, store.initialize.call_count)
+            self.assertEqual(
+                'some/directory%d' % i,
+                mock_store.call_args_list[i][0][1])
+
+    def test_update_reports_each_store(self):
+        manager = tm.TopicManager(self.test_conf)
+        stores = [mock.Mock(), mock.Mock(), mock.Mock()]
+        for i, store in enumerate(stores):
+            store.name = 'store%d' % i
+        stores[0].update.return_value = constants.UPDATE_CHANGED
+        stores[1].update.side_effect = exc.GitStoreError("Failed to pull")
+        stores[2].update.return_value = None
+        manager._topic_stores = stores
+        self.assertEqual([
+            ('store0', constants.UPDATE_CHANGED, ''),
+            ('store1', constants.UPDATE_FAILED, 'Failed to pull'),
+            ('store2', constants.UPDATE_SKIPPED, ''),
+        ], manager.update())
+        for store in stores:
+            self.assertEqual(1, store.update.call_count)
+
+    def test_update_times_out(self):
+        self.test_conf['eh'] = {'update_timeout': '0'}
+        manager = tm.TopicManager(self.test_conf)
+        store = mock.Mock()
+        store.name = 'slow'
+        store.update.side_effect = lambda: time.sleep(0.2)
+        manager._topic_stores = [store]
+        results = manager.update()
+        self.assertEqual(constants.UPDATE_FAILED, results[0][1])
+
+    def test_update_reports_any_error(self):
+        manager = tm.TopicManager(self.test_conf)
+        stores = [mock.Mock(), mock.Mock()]
+        for i, store in enumerate(stores):
+            store.name = 'store%d' % i
+        stores[0].update.side_effect = OSError("Disk full")
+        stores[1].update.return_value = constants.UPDATE_CHANGED
+        manager._topic_stores = stores
+        self.assertEqual([
+            ('store0', constants.UPDATE_FAILED, 'Disk full'),
+            ('store1', constants.UPDATE_CHANGED, ''),
+        ], manager.update())
+
+    def test_update_timeout_counts_from_start(self):
+        self.test_conf['eh'] = {'update_timeout': '1', 'workers': '1'}
+        manager = tm.TopicManager(self.test_conf)
+        stores = [mock.Mock(), mock.Mock()]
+        for i, store in enumerate(stores):
+            store.name = 'store%d' % i
+            store.update.side_effect = lambda: time.sleep(0.6)
+        manager._topic_stores = stores
+        start = time.time()
+        results = manager.update()
+        self.assertLess(time.time() - start, 1.5)
+        self.assertEqual(constants.UPDATE_SKIPPED, results[0][1])
+        self.assertEqual(constants.UPDATE_FAILED, results[1][1])
+
+    def test_update_clones_missing_git_store(self):
+        conf = ConfigObject()
+        conf['topic_stores'] = {'remote': 'https://github.com/eh/remote'}
+        with mock.patch('eh.git_store.GitTopicStore.initialize') as mock_init:
+            manager = tm.TopicManager(conf, initialize=False)
+        self.assertEqual(0, mock_init.call_count)
+        store = manager.topic_stores[0]
+        store._check_if_directories_exist = mock.Mock(return_value=False)
+        store.is_available = mock.Mock(return_value=True)
+        with mock.patch.object(store, '_init_repo') as mock_clone:
+            with mock.patch.object(store, 'initialize') as mock_init:
+                self.assertEqual(
+                    [('remote', constants.UPDATE_CLONED, '')],
+                    manager.update())
+        self.assertEqual(1, mock_clone.call_count)
+        mock_init.assert_called_once_with(conf)
+
+    def test_refresh_reloads_changed_stores(self):
+        manager = tm.TopicManager(self.test_conf)
+        stores = self._search_stores([], [])
+        stores[0].is_current.return_value = True
+        stores[1].is_current.return_value = False
+        manager._topic_stores = stores
+        self.assertTrue(manager.refresh())
+        self.assertEqual(0, stores[0].reload.call_count)
+        stores[1].reload.assert_called_once_with(self.test_conf)
+        stores[1].is_current.return_value = True
+        self.assertFalse(manager.refresh())
+
+    def test_update_no_stores(self):
+        manager = tm.TopicManager({})
+        self.assertEqual([], manager.update())
+
+    def _search_stores(self, *results):
+        stores = []
+        for i, scores in enumerate(results):
+            store = mock.Mock()
+            store.name = 'store%d' % i
+            store.key_map = {}
+            store.search_parent.return_value = None
+            store.meta_search.return_value = [
+                (score, store.name, mock.Mock()) for score in scores]
+            stores.append(store)
+        return stores
+
+    def test_meta_search_sorts_above_min_score(self):
+        manager = tm.TopicManager({}, min_score=30)
+        manager._topic_stores = self._search_stores([40, 20, 90], [60, 40])
+        results = manager.meta_search('thing')
+        self.assertEqual([90, 60, 40, 40], [r[0] for r in results])
+        self.assertEqual(
+            ['store0', 'store1', 'store0', 'store1'],
+            [r[1] for r in results])
+
+    def test_meta_search_limit(self):
+        manager = tm.TopicManager({}, min_score=30)
+        manager._topic_stores = self._search_stores([40, 20, 90], [60, 40])
+        results = manager.meta_search('thing', 2)
+        self.assertEqual([90, 60], [r[0] for r in results])
+        self.assertEqual(
+            manager.meta_search('thing')[:3],
+            manager.meta_search('thing', 3))
+
+    def test_meta_search_exact_key_short_circuits(self):
+        manager = tm.TopicManager({}, min_score=30)
+        stores = self._search_stores([40], [constants.MATCH, 50], [105])
+        exact = stores[1].meta_search.return_value[0]
+        stores[1].key_map = {'thing': exact[2]}
+        stores[2].key_map = {'thing': mock.Mock()}
+        manager._topic_stores = stores
+        self.assertEqual([exact], manager.meta_search('thing'))
+        for store in stores:
+            self.assertEqual(0, store.meta_search.call_count)
+
+    def test_meta_search_below_parent(self):
+        manager = tm.TopicManager({}, min_score=30)
+        stores = self._search_stores([90], [60], [50])
+        stores[0].search_parent.return_value = 'git'
+        stores[1].search_parent.return_value = os.path.join('git', 'sub')
+        stores[0].has_parent.return_value = False
+        stores[2].has_parent.return_value = False
+        manager._topic_stores = stores
+        lookup = os.path.join('git', 'sub', 'br')
+        parent = os.path.join('git', 'sub')
+        self.assertEqual(parent, manager.search_parent(lookup))
+        self.assertEqual([60], [r[0] for r in manager.meta_search(lookup)])
+        stores[1].meta_search.assert_called_with(lookup, 30, parent)
+        self.assertEqual(0, stores[0].meta_search.call_count)
+        self.assertEqual(0, stores[2].meta_search.call_count)
+
+    def test_meta_search_falls_back_to_all_topics(self):
+        manager = tm.TopicManager({}, min_score=30)
+        stores = self._search_stores([90], [60])
+        stores[0].search_parent.return_value = 'git'
+        stores[0].meta_search.side_effect = [
+            [(20, 'store0', mock.Mock())], [(90, 'store0', mock.Mock())]]
+        stores[1].has_parent.return_value = False
+        manager._topic_stores = stores
+        lookup = os.path.join('git', 'br')
+        self.assertEqual(
+            [90, 60], [r[0] for r in manager.meta_search(lookup)])
+        stores[0].meta_search.assert_called_with(lookup, 30, None)
+
+    def test_search_parent_needs_divider(self):
+        manager = tm.TopicManager({})
+        manager._topic_stores = self._search_stores([])
+        self.assertIsNone(manager.search_parent('git'))
+        self.assertEqual(
+            0, manager._topic_stores[0].search_parent.call_count)
+
+    def test_full_text_search_merges_stores(self):
+        manager = tm.TopicManager({})
+        stores = self._search_stores([], [])
+        stores[0].full_text_search.return_value = [(3.5, 'store0', 'a')]
+        stores[1].full_text_search.return_value = [
+            (4.0, 'store1', 'b'), (1.0, 'store1', 'c')]
+        manager._topic_stores = stores
+        self.assertEqual(
+            [(4.0, 'store1', 'b'), (3.5, 'store0', 'a')],
+            manager.full_text_search('thing', 2))
+        stores[0].full_text_search.assert_called_with('thing', 2)
+
+    def test_key_index_across_stores(self):
+        manager = tm.TopicManager({})
+        stores = self._search_stores([], [])
+        stores[0].key_map = {'git/rebase': 'rebase0'}
+        stores[1].key_map = {'git/rebase': 'rebase1', 'rebase': 'rebase2'}
+        manager._topic_stores = stores
+        self.assertTrue(manager.has_topic('git/rebase'))
+        self.assertEqual('rebase0', manager.get_topic('git/rebase'))
+        self.assertEqual('rebase2', manager.get_topic('rebase'))
+        self.assertIsNone(manager.get_topic('git'))
+
+    def test_key_index_respects_repos(self):
+        manager = tm.TopicManager({}, repos=['store1'])
+        stores = self._search_stores([], [])
+        stores[0].key_map = {'only0': 'topic0'}
+        manager._topic_stores = stores
+        self.assertFalse(manager.has_topic('only0'))
+
+    def test_key_index_rebuilt_after_update(self):
+        manager = tm.TopicManager({})
+        stores = self._search_stores([])
+        stores[0].update.return_value = constants.UPDATE_CHANGED
+        manager._topic_stores = stores
+        self.assertFalse(manager.has_topic('new'))
+        stores[0].key_map = {'new': 'topic'}
+        manager.update()
+        self.assertTrue(manager.has_topic('new'))
+
+    def _exact_conf(self, *names, **git_stores):
+        conf = ConfigObject()
+        conf['topic_stores'] = git_stores
+        for name in names:
+            root = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, root)
+            with open(os.path.join(root, 'topic.md'), 'w') as f:
+                f.write('[//]: # (tag) Summary of %s\n# Topic' % name)
+            conf['topic_stores'][name] = root
+        return conf
+
+    def test_find_exact_topic(self):
+        mock.patch.stopall()
+        conf = self._exact_conf('first', 'second')
+        found = tm.TopicManager.find_exact_topic(conf, [], 'topic')
+        self.assertEqual('Summary of first', found.summary)
+        found = tm.TopicManager.find_exact_topic(conf, ['second'], 'topic')
+        self.assertEqual('Summary of second', found.summary)
+        self.assertIsNone(tm.TopicManager.find_exact_topic(conf, [], 'top'))
+
+    def test_find_exact_topic_needs_cloned_stores(self):
+        mock.patch.stopall()
+        conf = self._exact_conf(
+            'second', first='https://github.com/roaet/nothing')
+        with mock.patch(
+                'eh.git_store.GitTopicStore.is_available') as mock_available:
+            mock_available.return_value = False
+            self.assertIsNone(
+                tm.TopicManager.find_exact_topic(conf, [], 'topic'))
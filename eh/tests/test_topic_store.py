@@ -1,3 +1,8 @@
+import contextlib
+import os
+import shutil
+import tempfile
+
 import mock
 
 from eh import constants
@@ -14,6 +19,35 @@ class TopicMock(mock.Mock):
     def is_topic(self, topic_key):
         return topic_key == self.topic
 
+    @property
+    def key(self):
+        return self.topic
+
+
+class FakeDirEntry(object):
+    def __init__(self, name, children):
+        self.name = name
+        self.children = children
+
+    def is_dir(self):
+        return self.children is not None
+
+
+def fake_scandir(tree, root='/'):
+    """
+    Returns a stand-in for os.scandir serving the nested dict tree; a value
+    of None is a file and a dict is a directory.
+    """
+    def scandir(path):
+        rel = os.path.relpath(path, root)
+        node = tree
+        if rel != '.':
+            for part in rel.split(os.sep):
+                node = node[part]
+        entries = [FakeDirEntry(k, v) for k, v in node.items()]
+        return contextlib.nullcontext(iter(entries))
+    return scandir
+
 
 class TestTopicStore(base.TestCase):
     def setUp(self):
@@ -82,8 +116,8 @@ class TestTopicStore(base.TestCase):
     def test_gather_topics_empty_dir(self):
         store = ts.TopicStore({}, "", 'test_store')
         self.assertEquals(0, store.topic_count())
-        with mock.patch('os.listdir', return_value=[]) as list_mock:
-            topics = store._gather_topics(self.conf, '/', '/')
+        with mock.patch('os.scandir', new=fake_scandir({})):
+            topics = store._gather_topics(self.conf, '/')
             self.assertEquals(0, len(topics))
             self.assertEquals(0, store.topic_count())
             self.assertIsNotNone(topics)
@@ -91,51 +125,69 @@ class TestTopicStore(base.TestCase):
     def test_gather_topics_one_item_no_ext(self):
         store = ts.TopicStore({}, "", 'test_store')
         self.assertEquals(0, store.topic_count())
-        with mock.patch('os.listdir', return_value=["thing"]) as list_mock:
-            topics = store._gather_topics(self.conf, '/', '/')
+        with mock.patch('os.scandir', new=fake_scandir({"thing": None})):
+            topics = store._gather_topics(self.conf, '/')
             self.assertEquals(0, len(topics))
             self.assertIsNotNone(topics)
 
     def test_gather_topics_one_item_with_ext(self):
         store = ts.TopicStore({}, "", 'test_store')
         self.assertEquals(0, store.topic_count())
-        with mock.patch('os.listdir', return_value=["thing.md"]) as list_mock:
-            topics = store._gather_topics(self.conf, '/', '/')
+        with mock.patch('os.scandir', new=fake_scandir({"thing.md": None})):
+            topics = store._gather_topics(self.conf, '/')
             self.assertEquals(1, len(topics))
             self.assertIsNotNone(topics)
 
     def test_gather_topics_removes_mainpath(self):
         store = ts.TopicStore({}, "", 'test_store')
         self.assertEquals(0, store.topic_count())
-        with mock.patch('os.listdir', return_value=["thing.md"]) as list_mock:
-            topics = store._gather_topics(self.conf, '/a/b/c', '/a/b/c/d')
+        tree = {"d": {"thing.md": None}}
+        with mock.patch('os.scandir', new=fake_scandir(tree, '/a/b/c')):
+            topics = store._gather_topics(self.conf, '/a/b/c')
             self.assertEquals(1, len(topics))
             self.assertIsNotNone(topics)
             self.assertTrue('/a/b/c' not in topics[0])
+            self.assertEquals('d/thing.md', topics[0])
 
     def test_gather_topics_mixed_items(self):
         store = ts.TopicStore({}, "", 'test_store')
         self.assertEquals(0, store.topic_count())
-        mixed_list = ["poop", "thing.md"]
-        with mock.patch('os.listdir', return_value=mixed_list) as list_mock:
-            topics = store._gather_topics(self.conf, '/', '/')
+        mixed = {"poop": None, "thing.md": None}
+        with mock.patch('os.scandir', new=fake_scandir(mixed)):
+            topics = store._gather_topics(self.conf, '/')
             self.assertEquals(1, len(topics))
             self.assertIsNotNone(topics)
 
-    @mock.patch('os.path.isdir')
-    @mock.patch('os.listdir')
-    def test_gather_topics_with_directory(
-            self, mock_listdir, mock_isdir):
-        mixed_list = ["a_dir", "thing.md"]
-        mock_isdir.side_effect = lambda x : x == '/a_dir'
-        mock_listdir.side_effect = (
-            lambda x : mixed_list if x != 'a_dir' else 'thing2.md')
+    def test_gather_topics_with_directory(self):
+        tree = {"a_dir": {"thing2.md": None}, "thing.md": None}
         store = ts.TopicStore({}, "", 'test_store')
         self.assertEquals(0, store.topic_count())
-
-        topics = store._gather_topics(self.conf, '/', '/')
-        self.assertEquals(2, len(topics))
-        self.assertIsNotNone(topics)
+        with mock.patch('os.scandir', new=fake_scandir(tree)):
+            topics = store._gather_topics(self.conf, '/')
+        self.assertEquals(['thing.md', 'a_dir/thing2.md'], topics)
+
+    def test_gather_topics_skips_ignored_dirs(self):
+        tree = {
+            ".git": {"HEAD.md": None},
+            "a_dir": {"b_dir": {"deep.md": None}, "thing2.md": None},
+        }
+        store = ts.TopicStore({}, "", 'test_store')
+        with mock.patch('os.scandir', new=fake_scandir(tree)):
+            topics = store._gather_topics(self.conf, '/')
+        self.assertEquals(['a_dir/thing2.md', 'a_dir/b_dir/deep.md'], topics)
+
+    def test_gather_topics_applies_selected_topics(self):
+        tree = {"a_dir": {"thing2.md": None}, "thing.md": None}
+        conf = {'test_store': {constants.CONF_TOPIC_KEY: 'a_dir/thing2, x'}}
+        store = ts.TopicStore(conf, "", 'test_store')
+        self.assertEquals(['a_dir/thing2', 'x'], store._selected_topics)
+        with mock.patch('os.scandir', new=fake_scandir(tree)):
+            topics = store._gather_topics(self.conf, '/')
+        self.assertEquals(['a_dir/thing2.md'], topics)
+
+    def test_gather_topics_empty_mainpath(self):
+        store = ts.TopicStore({}, "", 'test_store')
+        self.assertEquals([], store._gather_topics(self.conf, ''))
 
     @mock.patch('eh.topic.Topic', new_callable=TopicMock)
     def test_parse_topics_returned_topics_equals_paths(
@@ -251,3 +303,209 @@ class TestTopicStore(base.TestCase):
         store._topics = [t1]
         self.assertTrue(store.has_topic('poo'))
         self.assertFalse(store.has_topic('foo'))
+
+    def test_key_maps_follow_topics(self):
+        store = ts.TopicStore(self.conf, "", 'test_store')
+        t1 = TopicMock(shortkey='poo')
+        t1.topic = 'parent/poo'
+        t2 = TopicMock(shortkey='poo')
+        t2.topic = 'poo'
+        store._topics = [t1]
+        self.assertEqual({'parent/poo': t1}, store.key_map)
+        self.assertFalse(store.has_topic('poo'))
+        store._topics.append(t2)
+        store._topics_changed()
+        self.assertTrue(store.has_topic('poo'))
+        store._topics = []
+        self.assertEqual({}, store.key_map)
+
+    @mock.patch('eh.topic_index.TopicIndex.stat_file')
+    @mock.patch('eh.topic.Topic.parse_topic_header')
+    def test_parse_topics_uses_index(self, mock_ptc, mock_stat):
+        mock_stat.return_value = (1, 1)
+        mock_ptc.return_value = (['other'], 'Other')
+        store = ts.TopicStore(self.conf, "", 'test_store')
+        store.index.record('path1.md', (1, 1), ['tag'], 'Summary')
+        topics = store._parse_topics(
+            self.conf, {}, '/', ['path1.md', 'path2.md'])
+        self.assertEquals(2, len(topics))
+        self.assertEquals(['tag'], topics[0].meta)
+        self.assertEquals(1, mock_ptc.call_count)
+
+    @mock.patch('eh.topic.Topic.parse_topic_header')
+    @mock.patch('eh.topic.Topic.parse_topic_contents')
+    def test_parse_topics_lazy_can_be_disabled(self, mock_ptc, mock_pth):
+        mock_ptc.return_value = (['tag'], 'Summary', 'text')
+        mock_pth.return_value = (['tag'], 'Summary')
+        conf = {constants.CONF_EH: {constants.CONF_LAZY_TOPICS: 'false'}}
+        store = ts.TopicStore(conf, "", 'test_store')
+        store._parse_topics(conf, {}, '/', ['path1.md'])
+        self.assertEquals(1, mock_ptc.call_count)
+        self.assertEquals(0, mock_pth.call_count)
+
+        store = ts.TopicStore(self.conf, "", 'test_store')
+        store._parse_topics(self.conf, {}, '/', ['path1.md'])
+        self.assertEquals(1, mock_ptc.call_count)
+        self.assertEquals(1, mock_pth.call_count)
+
+    def test_walk_order(self):
+        paths = ['b/c.md', 'z.md', 'a/b/c.md', 'a/a.md', 'a.md']
+        self.assertEquals(
+            ['a.md', 'z.md', 'a/a.md', 'a/b/c.md', 'b/c.md'],
+            sorted(paths, key=ts.TopicStore.walk_order))
+
+    @mock.patch('eh.topic.Topic.parse_topic_header')
+    def test_reindex_paths(self, mock_pth):
+        mock_pth.return_value = (['tag'], 'Summary')
+        store = ts.TopicStore(self.conf, "/", 'test_store')
+        store.topic_paths = ['a.md', 'p/b.md', 'q/c.md']
+        store._topics = store._parse_topics(
+            self.conf, store.root_node, '/', store.topic_paths)
+        self.assertEquals(3, mock_pth.call_count)
+        store._reindex_paths(
+            self.conf, ['p/b.md', 'd.md', 'notes.txt'], ['q/c.md'])
+        self.assertEquals(5, mock_pth.call_count)
+        self.assertEquals(['a.md', 'd.md', 'p/b.md'], store.topic_paths)
+        self.assertEquals(
+            ['a', 'd', 'p/b'], [str(t.key) for t in store._topics])
+        self.assertTrue(store.has_parent('p'))
+        self.assertFalse(store.has_parent('q'))
+        self.assertFalse('q' in store.root_node)
+        self.assertEquals(1, len(store.root_node['p'][constants.TOPIC_KEY]))
+
+    def _write_store(self, count):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for i in range(count):
+            directory = os.path.join(root, 'dir%d' % (i % 3))
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(os.path.join(directory, 't%02d.md' % i), 'w') as f:
+                f.write('[//]: # (tag%d) Summary %d\n# Body %d\n' % (i, i, i))
+        return root + os.sep
+
+    @mock.patch('eh.topic_index.TopicIndex.save')
+    def test_is_current_and_reload(self, mock_save):
+        root = self._write_store(3)
+        store = ts.TopicStore(self.conf, root, 'test_store')
+        store.initialize(self.conf)
+        self.assertTrue(store.is_current(self.conf))
+        path = os.path.join(root, 'dir1', 't01.md')
+        with open(path, 'w') as f:
+            f.write('[//]: # (tag1) Changed summary\n# Body\n')
+        self.assertFalse(store.is_current(self.conf))
+        store.reload(self.conf)
+        self.assertTrue(store.is_current(self.conf))
+        self.assertEqual(
+            'Changed summary',
+            store.key_map[os.path.join('dir1', 't01')].summary)
+        self.assertEqual(3, store.topic_count())
+        os.remove(path)
+        self.assertFalse(store.is_current(self.conf))
+        store.reload(self.conf)
+        self.assertEqual(2, store.topic_count())
+        self.assertNotIn(os.path.join('dir1', 't01'), store.key_map)
+
+    @mock.patch('eh.topic_index.TopicIndex.save')
+    def test_parallel_parse_matches_serial(self, mock_save):
+        root = self._write_store(constants.PARALLEL_PARSE_MIN * 2)
+        results = []
+        for workers in ['1', '4']:
+            conf = {constants.CONF_EH: {constants.CONF_WORKERS: workers}}
+            store = ts.TopicStore(conf, root, 'test_store')
+            store.initialize(conf)
+            results.append([
+                (str(t.key), t.meta, t.summary, t.text)
+                for t in store.get_all_topics()])
+        self.assertEquals(constants.PARALLEL_PARSE_MIN * 2, len(results[0]))
+        self.assertEquals(results[0], results[1])
+
+    def test_read_topics_skipped_for_few_topics(self):
+        conf = {constants.CONF_EH: {constants.CONF_WORKERS: '4'}}
+        store = ts.TopicStore(conf, "", 'test_store')
+        with mock.patch('eh.topic.Topic.parse_topic_header') as mock_pth:
+            self.assertEquals({}, store._read_topics(conf, {}, '/', ['a.md']))
+            self.assertEquals(0, mock_pth.call_count)
+
+    def test_find_topic_path(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.makedirs(os.path.join(root, 'parent', '.git'))
+        for path in [
+                os.path.join('parent', 'topic.md'),
+                os.path.join('parent', '.git', 'topic.md'),
+                'other.md']:
+            with open(os.path.join(root, path), 'w') as f:
+                f.write('[//]: # (tag) Summary')
+        store = ts.TopicStore(self.conf, root, 'test_store')
+        key = os.path.join('parent', 'topic')
+        self.assertEqual(key + '.md', store.find_topic_path(self.conf, key))
+        self.assertIsNone(store.find_topic_path(self.conf, 'parent'))
+        self.assertIsNone(store.find_topic_path(self.conf, 'missing'))
+        self.assertIsNone(store.find_topic_path(
+            self.conf, os.path.join('parent', '.git', 'topic')))
+        self.assertIsNone(store.find_topic_path(
+            self.conf, os.path.join('parent', '..', 'other')))
+        store._selected_topics = ['other']
+        self.assertIsNone(store.find_topic_path(self.conf, key))
+        self.assertEqual(
+            'other.md', store.find_topic_path(self.conf, 'other'))
+
+    def test_meta_search_uses_query_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        mock.patch('eh.constants.CACHE_DIR', cache_dir).start()
+        store = ts.TopicStore(self.conf, "", 'test_store')
+        t1 = TopicMock()
+        t1.topic = 'topic1'
+        store._topics = [t1]
+        index = mock.patch('eh.search_index.SearchIndex').start()
+        search = index.return_value.search
+        search.return_value = [(60.0, t1)]
+        self.assertEqual(
+            [(60.0, 'test_store', t1)], store.meta_search('topic', 35))
+        self.assertEqual(
+            [(60.0, 'test_store', t1)], store.meta_search('topic', 35))
+        self.assertEqual(1, search.call_count)
+        store.index.record('topic1.md', (1, 1), [], None)
+        store._topics = [t1]
+        store.meta_search('topic', 35)
+        self.assertEqual(2, search.call_count)
+
+    def test_full_text_search(self):
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        mock.patch('eh.constants.INDEX_DIR', index_dir).start()
+        root = self._write_store(3)
+        conf = {constants.CONF_EH: {constants.CONF_FULL_TEXT: 'true'}}
+        store = ts.TopicStore(conf, root, 'test_store')
+        store.initialize(conf)
+        self.assertTrue(os.path.exists(store.fulltext_index.path))
+        results = store.full_text_search('body 1')
+        self.assertEqual('test_store', results[0][1])
+        self.assertEqual(
+            os.path.join('dir1', 't01.md'), results[0][2].path)
+        self.assertEqual(1, len(store.full_text_search('body', 1)))
+
+    def test_full_text_index_built_on_demand(self):
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        mock.patch('eh.constants.INDEX_DIR', index_dir).start()
+        root = self._write_store(2)
+        store = ts.TopicStore(self.conf, root, 'test_store')
+        store.initialize(self.conf)
+        self.assertFalse(os.path.exists(store.fulltext_index.path))
+        self.assertEqual(2, len(store.full_text_search('body')))
+        self.assertTrue(os.path.exists(store.fulltext_index.path))
+
+    def test_search_parent(self):
+        store = ts.TopicStore(self.conf, "", 'test_store')
+        store.root_node[constants.PARENT_KEY] = {
+            'git': {}, os.path.join('git', 'sub'): {}}
+        self.assertEqual(
+            os.path.join('git', 'sub'),
+            store.search_parent(os.path.join('git', 'sub', 'br')))
+        self.assertEqual(
+            'git', store.search_parent(os.path.join('git', 'su')))
+        self.assertIsNone(store.search_parent('git'))
+        self.assertIsNone(store.search_parent(os.path.join('gi', 'br')))
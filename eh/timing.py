@@ -0,0 +1,67 @@
+import collections
+import contextlib
+import json
+import threading
+import time
+
+
+class Timings(object):
+    """
+    The Timings class adds up how long each phase of an eh command takes.
+
+    Phases are recorded in the order they first ran, in seconds:
+
+        phases = {"config": 0.002, "walk": 0.010, "parse": 0.031, ...}
+
+    Stores are walked and parsed on several threads at once, so the time of
+    those phases is the sum over all stores rather than the time waited.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = collections.OrderedDict()
+
+    def reset(self):
+        with self._lock:
+            self.phases = collections.OrderedDict()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def milliseconds(self):
+        """
+        Returns (phase, milliseconds) for every recorded phase.
+        """
+        with self._lock:
+            return [
+                (name, round(seconds * 1000, 3))
+                for name, seconds in self.phases.items()]
+
+    def to_json(self):
+        phases = collections.OrderedDict(self.milliseconds())
+        return json.dumps({
+            'unit': 'ms',
+            'phases': phases,
+            'total': round(sum(phases.values()), 3),
+        })
+
+
+TIMINGS = Timings()
+
+
+def phase(name):
+    """
+    Time a phase of the current command, e.g.
+
+        with timing.phase('search'):
+            ...
+    """
+    return TIMINGS.phase(name)
@@ -1,12 +1,20 @@
 import os
-import yaml
 
 from eh import constants
 from eh import exceptions as exc
 from eh import topic_key as tk
 
 class Topic(object):
-    def __init__(self, conf, root_node, rootpath, path):
+    def __init__(
+            self, conf, root_node, rootpath, path, header=None, lazy=False,
+            text=None):
+        """
+        header - optional (meta, summary) tuple, usually from a TopicIndex.
+                 When given the topic file is not read until text is needed.
+        text - optional body of the topic, only used along with header.
+        lazy - only read the preamble (or front matter) of the topic file
+               now and leave the rest for the first access of text.
+        """
         self.path = path
         if root_node is None or not isinstance(root_node, dict):
             raise exc.TopicStoreInvalidRoot()
@@ -14,14 +22,26 @@ class Topic(object):
         if rootpath is None or not isinstance(rootpath, str) or not rootpath:
             raise exc.TopicInvalidRootPath()
         self.rootpath = rootpath
-        self.meta, self.summary, self.text = (
-            Topic.parse_topic_contents(conf, root_node, rootpath, path))
+        self.conf = conf
+        if header is None and lazy:
+            self.meta, self.summary = Topic.parse_topic_header(
+                conf, root_node, rootpath, path)
+            self._text = None
+        elif header is None:
+            self.meta, self.summary, self._text = (
+                Topic.parse_topic_contents(conf, root_node, rootpath, path))
+        else:
+            self.meta, self.summary = header
+            self._text = text
         self.key = tk.TopicKey(conf, self.path, self.meta)
         Topic.map_topic_path_to_root_node(conf, root_node, path, self)
 
     def meta_match(self, meta_string):
         return self.key.metascore(meta_string, self.summary)
 
+    def meta_scores(self, meta_string):
+        return self.key.metascores(meta_string, self.summary)
+
     def is_topic(self, topic):
         if self.key.matches(topic):
             return True
@@ -31,6 +51,12 @@ class Topic(object):
     def shortkey(self):
         return self.key.shortkey
 
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = Topic.read_topic_text(self.rootpath, self.path)
+        return self._text
+
     def __repr__(self):
         return constants.STR_TOPIC_REPR % (
             self.key, len(self.text), self.meta, self.summary)
@@ -55,15 +81,41 @@ class Topic(object):
                 if parent_path not in root_node[constants.PARENT_KEY]:
                     root_node[constants.PARENT_KEY][parent_path] = current_node
 
+    @staticmethod
+    def unmap_topic_path_from_root_node(conf, root_node, path, node):
+        """
+        Undo map_topic_path_to_root_node: remove node from the graph and drop
+        every parent that is left without topics or subtopics.
+        """
+        path_parts = path.split(constants.KEY_DIVIDE_CHAR)
+        nodes = [root_node]
+        for p in path_parts[:-1]:
+            if p not in nodes[-1]:
+                return
+            nodes.append(nodes[-1][p])
+        leaf = nodes[-1]
+        if node in leaf.get(constants.TOPIC_KEY, []):
+            leaf[constants.TOPIC_KEY].remove(node)
+        if not leaf.get(constants.TOPIC_KEY, True):
+            del leaf[constants.TOPIC_KEY]
+        for i in range(len(path_parts) - 1, 0, -1):
+            current_node = nodes[i]
+            if any(k != constants.PARENT_KEY for k in current_node):
+                break
+            del nodes[i - 1][path_parts[i - 1]]
+            parent_path = constants.KEY_DIVIDE_CHAR.join(path_parts[0:i])
+            root_node.get(constants.PARENT_KEY, {}).pop(parent_path, None)
+
     @staticmethod
     def get_cheatsheet_parts(data):
+        import yaml
         data_copy = data[:]
         data_copy.pop(0)
         header = []
         end_header_found = False
         while not end_header_found:
             line = data_copy.pop(0)
-            if line == '---':
+            if line == constants.FRONT_MATTER_CHAR:
                 end_header_found = True
                 break
             header.append(line)
@@ -91,7 +143,7 @@ class Topic(object):
     def determine_format(data):
         data_copy = data[:]
         top_line = data_copy[0]
-        if top_line == '---':  # possibly cheatsheet format
+        if top_line == constants.FRONT_MATTER_CHAR:  # possibly cheatsheet
             if Topic.check_cheatsheet_format(data):
                 return 'cheatsheet'
         if not Topic.check_comment_format(top_line):
@@ -130,6 +182,69 @@ class Topic(object):
             pass
         return None, None, None
 
+    @staticmethod
+    def read_topic_header(root, path):
+        """
+        Reads only the lines needed to parse the meta tags and summary of a
+        topic: the preamble line, or the whole front matter of a cheatsheet.
+        """
+        fullpath = os.path.join(root, path)
+        data = []
+        with open(fullpath, 'r') as myfile:
+            for line in myfile:
+                data.append(line.rstrip('\r\n'))
+                if len(data) == 1 and data[0] != constants.FRONT_MATTER_CHAR:
+                    break
+                if len(data) > 1 and data[-1] == constants.FRONT_MATTER_CHAR:
+                    break
+        return data
+
+    @staticmethod
+    def parse_topic_header(conf, root_node, root, path):
+        """
+        Same as parse_topic_contents but returns only (meta, summary) and does
+        not read past the topic header.
+        """
+        try:
+            data = Topic.read_topic_header(root, path)
+            if not data:
+                raise exc.TopicError("Empty topic")
+            file_format = Topic.determine_format(data)
+            if file_format == 'eh':
+                meta, summary, _text = Topic.parse_eh_format(data)
+                return meta, summary
+            if file_format == 'cheatsheet':
+                meta, summary, _text = Topic.parse_cheatsheet_format(data)
+                return meta, summary
+        except IOError:
+            pass
+        return None, None
+
+    @staticmethod
+    def read_topic_text(root, path):
+        """
+        Returns the body of a topic without parsing its header.
+
+        A topic starting with front matter can only be a cheatsheet, so its
+        body starts after the closing line of the front matter; otherwise the
+        body starts after the preamble line.
+        """
+        fullpath = os.path.join(root, path)
+        try:
+            with open(fullpath, 'r') as myfile:
+                data = myfile.read().splitlines()
+        except IOError:
+            return None
+        if not data:
+            return constants.EMPTY
+        if data[0] == constants.FRONT_MATTER_CHAR:
+            try:
+                end = data.index(constants.FRONT_MATTER_CHAR, 1)
+            except ValueError:
+                return constants.EMPTY
+            return constants.CR_CHAR.join(data[end+1:])
+        return constants.CR_CHAR.join(data[1:])
+
     @staticmethod
     def remove_comment_preamble(text):
         """
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+
+from eh import constants
+
+
+class TopicIndex(object):
+    """
+    The TopicIndex class is a persistent record of the parsed topics of a
+    single topic store.
+
+    It is saved as JSON under constants.INDEX_DIR using the name of the store.
+    Each entry is keyed by the topic path (relative to the store root) and
+    looks like this:
+
+        entries = {
+            "parent/topic.md": {
+                "mtime": 1476000000000000000,
+                "size": 512,
+                "meta": ["tag1", "tag2"],
+                "summary": "Summary..."
+            }
+        }
+
+    An entry is only trusted while the mtime and size of the topic file match
+    what was recorded, so a warm lookup never has to open a topic file to
+    learn its meta tags or summary.
+
+    head is the commit the index was built from for stores kept in git and
+    selected is the list of selected topics the index was built with.
+    """
+    def __init__(self, name, filepath):
+        self.name = name
+        self.filepath = filepath
+        self.path = os.path.join(
+            constants.INDEX_DIR, '%s%s' % (name, constants.INDEX_EXT))
+        self.entries = {}
+        self.head = None
+        self.selected = []
+        self.dirty = False
+
+    def load(self):
+        """
+        Load the index from disk. A missing, unreadable or outdated index
+        simply results in an empty index that will be rebuilt.
+        """
+        self.entries = {}
+        self.head = None
+        self.selected = []
+        self.dirty = False
+        try:
+            with open(self.path, 'r') as index_file:
+                data = json.load(index_file)
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get('version') != constants.INDEX_VERSION:
+            return
+        if data.get('filepath') != self.filepath:
+            return
+        self.entries = data.get('topics', {})
+        self.head = data.get('head')
+        self.selected = data.get('selected', [])
+
+    def save(self):
+        """
+        Write the index to disk if anything changed since it was loaded.
+
+        The index is written to a temporary file named after the process
+        first and moved in place, so that a concurrent eh never sees or
+        writes into a partial index.
+        """
+        if not self.dirty:
+            return
+        data = {
+            'version': constants.INDEX_VERSION,
+            'filepath': self.filepath,
+            'head': self.head,
+            'selected': self.selected,
+            'topics': self.entries,
+        }
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            if not os.path.exists(constants.INDEX_DIR):
+                os.makedirs(constants.INDEX_DIR)
+            with open(tmp_path, 'w') as index_file:
+                json.dump(data, index_file)
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError):
+            return
+        self.dirty = False
+
+    def lookup(self, path, stat):
+        """
+        Returns the (meta, summary) recorded for path if the stat data still
+        matches, otherwise None.
+        """
+        if stat is None:
+            return None
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        if (entry.get('mtime'), entry.get('size')) != stat:
+            return None
+        return entry.get('meta'), entry.get('summary')
+
+    def header(self, path):
+        """
+        Returns the (meta, summary) recorded for path without checking the
+        file, or None if there is no entry.
+        """
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        return entry.get('meta'), entry.get('summary')
+
+    def record(self, path, stat, meta, summary):
+        if stat is None or meta is None:
+            return
+        self.entries[path] = {
+            'mtime': stat[0],
+            'size': stat[1],
+            'meta': meta,
+            'summary': summary,
+        }
+        self.dirty = True
+
+    def remove(self, path):
+        if path in self.entries:
+            del self.entries[path]
+            self.dirty = True
+
+    def digest(self):
+        """
+        Returns a digest of the recorded topics and their stat data, which
+        changes whenever a topic file is added, removed or modified.
+        """
+        digest = hashlib.sha1()
+        for path in sorted(self.entries):
+            entry = self.entries[path]
+            digest.update(('%s %s %s%s' % (
+                path, entry.get('mtime'), entry.get('size'),
+                constants.CR_CHAR)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def set_head(self, head, selected):
+        if head != self.head or selected != self.selected:
+            self.head = head
+            self.selected = selected
+            self.dirty = True
+
+    def prune(self, paths):
+        """
+        Drop every entry whose path is not in paths.
+        """
+        keep = set(paths)
+        for path in list(self.entries.keys()):
+            if path not in keep:
+                del self.entries[path]
+                self.dirty = True
+
+    @staticmethod
+    def stat_file(rootpath, path):
+        """
+        Returns the (mtime, size) pair used to validate an entry or None if
+        the file cannot be read.
+        """
+        try:
+            st = os.stat(os.path.join(rootpath, path))
+        except (IOError, OSError, TypeError):
+            return None
+        return st.st_mtime_ns, st.st_size
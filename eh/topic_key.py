@@ -1,5 +1,3 @@
-from fuzzywuzzy import fuzz
-
 from eh import constants
 
 class TopicKey(object):
@@ -12,6 +10,9 @@ class TopicKey(object):
     def metascore(self, meta_string, summary):
         return TopicKey.get_key_metascore(self, meta_string, summary)
 
+    def metascores(self, meta_string, summary):
+        return TopicKey.get_key_metascores(self, meta_string, summary)
+
     def matches(self, topic_string):
         if topic_string == str(self):
             return True
@@ -32,6 +33,7 @@ class TopicKey(object):
 
     @staticmethod
     def _key_metascore(lookup, key):
+        from fuzzywuzzy import fuzz
         s = fuzz.ratio(lookup, str(key))
         if lookup == str(key):
             s = constants.MATCH
@@ -39,6 +41,7 @@ class TopicKey(object):
 
     @staticmethod
     def _shortkey_metascore(lookup, key):
+        from fuzzywuzzy import fuzz
         s = fuzz.ratio(lookup, key.shortkey)
         if lookup == key.shortkey:
             s = constants.MATCH
@@ -46,6 +49,7 @@ class TopicKey(object):
 
     @staticmethod
     def _meta_metascore(lookup, key):
+        from fuzzywuzzy import fuzz
         l = lookup.replace(constants.KEY_DIVIDE_CHAR, ' ')
         s = fuzz.token_set_ratio(l, ' '.join(key.meta))
         if lookup == ','.join(key.meta):
@@ -54,6 +58,7 @@ class TopicKey(object):
 
     @staticmethod
     def _summary_metascore(lookup, summary):
+        from fuzzywuzzy import fuzz
         l = lookup.replace(constants.KEY_DIVIDE_CHAR, ' ')
         s = fuzz.token_set_ratio(l, summary)
         if lookup == summary:
@@ -61,16 +66,30 @@ class TopicKey(object):
         return s, s * constants.SUMMARY_WEIGHT
 
     @staticmethod
-    def get_key_metascore(key, lookup, summary):
+    def get_key_metascores(key, lookup, summary):
+        """
+        Returns the (shortkey, key, meta, summary) scores, each between 0 and
+        100, that get_key_metascore weighs and adds up.
+        """
         key_score, key_ratio = TopicKey._key_metascore(lookup, key)
         short_score, short_ratio = TopicKey._shortkey_metascore(lookup, key)
         meta_score, meta_ratio = TopicKey._meta_metascore(lookup, key)
         summary_score, summary_ratio = TopicKey._summary_metascore(
             lookup, summary)
+        return short_score, key_score, meta_score, summary_score
+
+    @staticmethod
+    def get_key_metascore(key, lookup, summary):
+        short_score, key_score, meta_score, summary_score = (
+            TopicKey.get_key_metascores(key, lookup, summary))
 
         if key_score == constants.MATCH:
             return constants.MATCH
-        final = short_ratio + key_ratio + meta_ratio + summary_ratio
+        final = (
+            short_score * constants.SHORTKEY_WEIGHT +
+            key_score * constants.KEY_WEIGHT +
+            meta_score * constants.META_WEIGHT +
+            summary_score * constants.SUMMARY_WEIGHT)
         return final 
 
     def __repr__(self):
@@ -1,15 +1,65 @@
+import concurrent.futures
+import heapq
 import os
 
+from eh import completion
+from eh import config
 from eh import constants
+from eh import exceptions as exc
+from eh import topic
 from eh import topic_store as ts
 from eh import git_store as gs
 
 
 class TopicManager(object):
-    def __init__(self, conf, repos=[], min_score=30):
+    """
+    The TopicManager class gives access to the topics of all configured
+    topic stores, limited to repos if any are given.
+
+    Exact lookups go through a key index over all stores, built from the
+    key_map of each store the first time it is needed:
+
+        keys = {"git/rebase": [(store, topic), ...]}
+
+    Entries are in store order. The index is dropped whenever the stores
+    change or are updated.
+    """
+    def __init__(self, conf, repos=[], min_score=30, initialize=True):
+        """
+        initialize - read the stores now. When False the stores are only
+                     created, so that update can clone missing git stores
+                     itself; they are then read once they are updated.
+        """
+        self.conf = conf
         self.repos = repos
         self.min_score = min_score
-        self._topic_stores = self._gather_topics(conf)
+        self._initialized = initialize
+        if initialize:
+            self._topic_stores = self._gather_topics(conf)
+        else:
+            self._topic_stores = TopicManager._make_stores(conf, repos)
+
+    @property
+    def _topic_stores(self):
+        return self._stores
+
+    @_topic_stores.setter
+    def _topic_stores(self, stores):
+        self._stores = stores
+        self._key_index = None
+
+    @property
+    def key_index(self):
+        """
+        Returns the key index of the stores in topic_stores.
+        """
+        if self._key_index is None:
+            keys = {}
+            for s in self.topic_stores:
+                for key, t in s.key_map.items():
+                    keys.setdefault(key, []).append((s, t))
+            self._key_index = keys
+        return self._key_index
 
     @property
     def topic_stores(self):
@@ -21,50 +71,223 @@ class TopicManager(object):
                 out.append(s)
         return out
 
-    def _topic_store_path(self, name):
+    @staticmethod
+    def _topic_store_path(name):
         return os.path.join(constants.CONF_DIR, name)
 
-    def _gather_topics(self, conf):
+    @staticmethod
+    def _make_stores(conf, repos):
+        """
+        Create the configured topic stores, limited to repos if any are
+        given, in the order they are configured in. Nothing is read yet.
+        """
         out = []
         if not conf:
             return out
         for name, location in conf.items(constants.CONF_TOPIC_STORE):
-            if len(self.repos) > 0 and name not in self.repos:
+            if len(repos) > 0 and name not in repos:
                 continue
             if location.startswith('https://github.com/'):
                 t_store = gs.GitTopicStore(
-                    conf, location, self._topic_store_path(name), name)
+                    conf, location, TopicManager._topic_store_path(name),
+                    name)
             else:
                 t_store = ts.TopicStore(conf, location, name)
-            t_store.initialize(conf)
             out.append(t_store)
         return out
 
+    @staticmethod
+    def find_exact_topic(conf, repos, key):
+        """
+        Returns the topic whose key is key by looking for its file in each
+        store, without walking or indexing any of them.
+
+        Returns None whenever the stores have to be searched instead: no
+        store has the file, a git store has not been cloned yet or the file
+        is not a valid topic.
+        """
+        for s in TopicManager._make_stores(conf, repos):
+            if not s.is_available():
+                return None
+            path = s.find_topic_path(conf, key)
+            if path is None:
+                continue
+            try:
+                return topic.Topic(
+                    conf, s.root_node, s.filepath, path, lazy=True)
+            except exc.TopicError:
+                return None
+        return None
+
+    def _gather_topics(self, conf):
+        """
+        Create and initialize the configured topic stores.
+        """
+        out = TopicManager._make_stores(conf, self.repos)
+        self._initialize_stores(conf, out)
+        return out
+
+    def _initialize_stores(self, conf, stores):
+        """
+        Initialize stores concurrently on at most `workers` threads (see the
+        [eh] section of the configuration).
+        """
+        workers = self._workers(conf)
+        if workers <= 1 or len(stores) <= 1:
+            for t_store in stores:
+                t_store.initialize(conf)
+            return
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            list(pool.map(lambda s: s.initialize(conf), stores))
+
+    def refresh(self):
+        """
+        Read again every store whose files changed since it was read (see
+        TopicStore.is_current) and return True if any did.
+        """
+        stale = [
+            s for s in self._topic_stores if not s.is_current(self.conf)]
+        if not stale:
+            return False
+        workers = self._workers(self.conf)
+        if workers <= 1 or len(stale) <= 1:
+            for t_store in stale:
+                t_store.reload(self.conf)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+                list(pool.map(lambda s: s.reload(self.conf), stale))
+        self._key_index = None
+        return True
+
+    def _workers(self, conf):
+        return config.get_int_option(
+            conf, constants.CONF_EH, constants.CONF_WORKERS,
+            constants.DEFAULT_WORKERS)
+
     def update(self):
-        for s in self.topic_stores:
-            s.update()
+        """
+        Update all stores concurrently and return a list of
+        (store name, status, detail) in store order, where status is one of
+        the UPDATE_ constants.
+
+        A store that fails, or has not finished update_timeout seconds
+        after the update started, is marked as failed without affecting the
+        others. The timeout does not stop a store that is still running:
+        git commands talking to the remote are killed after the timeout, but
+        anything else hanging keeps eh from exiting until it is done.
+
+        If the manager was created without initializing its stores, the
+        stores that finished and are available are initialized afterwards;
+        a store whose clone failed or timed out is left empty.
+        """
+        stores = self.topic_stores
+        if not stores:
+            return []
+        timeout = config.get_int_option(
+            self.conf, constants.CONF_EH, constants.CONF_UPDATE_TIMEOUT,
+            constants.DEFAULT_UPDATE_TIMEOUT)
+        workers = max(1, min(self._workers(self.conf), len(stores)))
+        pool = concurrent.futures.ThreadPoolExecutor(workers)
+        futures = [pool.submit(s.update) for s in stores]
+        done, _ = concurrent.futures.wait(futures, timeout)
+        results = []
+        for s, future in zip(stores, futures):
+            if future not in done:
+                future.cancel()
+                status = constants.UPDATE_FAILED
+                detail = "Timed out after %d seconds" % timeout
+            elif future.exception() is not None:
+                status = constants.UPDATE_FAILED
+                detail = str(future.exception()).strip()
+            else:
+                status = future.result() or constants.UPDATE_SKIPPED
+                detail = constants.EMPTY
+            results.append((s.name, status, detail))
+        pool.shutdown(wait=False)
+        if not self._initialized:
+            self._initialize_stores(self.conf, [
+                s for s, future in zip(stores, futures)
+                if future in done and s.is_available()])
+            self._initialized = True
+        self._key_index = None
+        return results
 
     def has_topic(self, topic):
-        for s in self.topic_stores:
-            if s.has_topic(topic):
-                return True
-        return False
+        return topic in self.key_index
 
     def get_topic(self, topic):
-        for s in self.topic_stores:
-            if s.has_topic(topic):
-                return s.get_topic(topic)
-        return None
+        hits = self.key_index.get(topic)
+        if not hits:
+            return None
+        return hits[0][1]
 
-    def meta_search(self, meta_string):
-        out = []
-        for s in self.topic_stores:
-            meta_results = s.meta_search(meta_string)
-            if len(meta_results) > 0:
-                out.extend([
-                    r for r in meta_results if r[0] > self.min_score])
-        out_sort = sorted(out, key=lambda x: x[0], reverse=True)
-        return out_sort
+    def meta_search(self, meta_string, limit=None):
+        """
+        Returns (score, store name, topic) for the topics scoring above
+        min_score, best first.
+
+        Only the limit best results are kept (all of them if limit is None),
+        on a heap instead of by sorting every result. A topic whose key is
+        meta_string is returned on its own, found in the key index without
+        searching at all.
+
+        When meta_string starts with a parent, such as git/ in git/br, only
+        the topics below the longest such parent are searched. All topics
+        are searched if none of those score above min_score.
+        """
+        hits = self.key_index.get(meta_string)
+        if hits:
+            s, t = hits[0]
+            return [(constants.MATCH, s.name, t)]
+
+        def results(parent=None):
+            for s in self.topic_stores:
+                if parent is not None and not s.has_parent(parent):
+                    continue
+                for r in s.meta_search(meta_string, self.min_score, parent):
+                    if r[0] > self.min_score:
+                        yield r
+
+        score = (lambda x: x[0])
+        parent = self.search_parent(meta_string)
+        if parent is not None:
+            found = list(results(parent))
+            if found:
+                if limit is None:
+                    return sorted(found, key=score, reverse=True)
+                return heapq.nlargest(limit, found, key=score)
+        if limit is None:
+            return sorted(results(), key=score, reverse=True)
+        return heapq.nlargest(limit, results(), key=score)
+
+    def search_parent(self, meta_string):
+        """
+        Returns the longest parent of any store that meta_string starts with,
+        or None.
+        """
+        if constants.KEY_DIVIDE_CHAR not in meta_string:
+            return None
+        parents = [s.search_parent(meta_string) for s in self.topic_stores]
+        parents = [p for p in parents if p is not None]
+        if not parents:
+            return None
+        return max(parents, key=len)
+
+    def full_text_search(self, query, limit=None):
+        """
+        Returns (score, store name, topic) for the topics whose text matches
+        query, best first, ranked with BM25 by the full text index of each
+        store. Only the limit best results are kept if limit is given.
+        """
+        def results():
+            for s in self.topic_stores:
+                for r in s.full_text_search(query, limit):
+                    yield r
+
+        score = (lambda x: x[0])
+        if limit is None:
+            return sorted(results(), key=score, reverse=True)
+        return heapq.nlargest(limit, results(), key=score)
 
     def has_parent(self, parent):
         for s in self.topic_stores:
@@ -89,5 +312,20 @@ class TopicManager(object):
             out.extend([(s.name, t) for t in s.get_all_topics()])
         return out
 
+    def write_completion(self):
+        """
+        Write the completion trie used by eh_autocomplete with the keys of
+        all topics and their parents. Nothing is written when the manager
+        is limited to some repos.
+        """
+        if self.repos:
+            return
+        words = set()
+        for name, t in self.get_all_topics():
+            parts = str(t.key).split(constants.KEY_DIVIDE_CHAR)
+            for i in range(1, len(parts) + 1):
+                words.add(constants.KEY_DIVIDE_CHAR.join(parts[:i]))
+        completion.CompletionTrie.write(words)
+
     def get_root_list(self):
         return self.get_topics_for_parent("")
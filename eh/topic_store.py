@@ -1,8 +1,16 @@
+import concurrent.futures
 import os
 
+from eh import config
 from eh import constants
 from eh import exceptions as exc
+from eh import fulltext_index
+from eh import query_cache
+from eh import search_index
+from eh import timing
 from eh import topic
+from eh import topic_index
+from eh import topic_key as tk
 
 class TopicStore(object):
     """
@@ -31,62 +39,234 @@ class TopicStore(object):
 
     self._topics is a flattened list of all topic objects in this store
 
+    self.index is the persistent TopicIndex of this store; topics whose files
+    have not changed since the index was written are created from it without
+    being read.
+
+    self.search_index is the SearchIndex meta_search uses to skip topics
+    that cannot match. It is built on the first search after the topics
+    change, as is self.key_map (key -> topic).
+
+    self.query_cache is the QueryCache holding earlier meta_search results,
+    valid for as long as version_stamp() does not change.
+
+    self.fulltext_index is the FullTextIndex over the text of the topics,
+    saved next to self.index. It is kept up to date whenever the store is
+    initialized or updated if full_text is turned on in the configuration,
+    and otherwise built on the first full text search.
+
     """
     def __init__(self, conf, filepath, name):
+        self.conf = conf
         self.root_node = {}
         self.root_node[constants.PARENT_KEY] = {}
         self.name = name
         self.filepath = filepath
         self.topic_paths = []
         self._topics = []
+        self._stats = {}
         self._selected_topics = self._create_selective_list(conf, name)
+        self._lazy = config.is_true(config.get_option(
+            conf, constants.CONF_EH, constants.CONF_LAZY_TOPICS, 'true'))
+        self._workers = config.get_int_option(
+            conf, constants.CONF_EH, constants.CONF_WORKERS,
+            constants.DEFAULT_WORKERS)
+        self._query_cache_size = config.get_int_option(
+            conf, constants.CONF_EH, constants.CONF_QUERY_CACHE_SIZE,
+            constants.DEFAULT_QUERY_CACHE_SIZE)
+        self._full_text = config.is_true(config.get_option(
+            conf, constants.CONF_EH, constants.CONF_FULL_TEXT, 'false'))
+        self.index = topic_index.TopicIndex(name, filepath)
+        self.fulltext_index = fulltext_index.FullTextIndex(name, filepath)
+
+    @property
+    def _topics(self):
+        return self._topic_list
+
+    @_topics.setter
+    def _topics(self, topics):
+        self._topic_list = topics
+        self._topics_changed()
+
+    def _topics_changed(self):
+        """
+        Drop everything built from the topics; call it after changing the
+        topic list in place.
+        """
+        self._search_index = None
+        self._key_map = None
+        self._query_cache = None
 
     def initialize(self, conf):
-        self.topic_paths = self._gather_topics(
-            conf, self.filepath, self.filepath)
-        self._topics = self._parse_topics(
-            conf, self.root_node, self.filepath, self.topic_paths)
+        self.index.load()
+        with timing.phase('walk'):
+            self.topic_paths = self._gather_topics(conf, self.filepath)
+        with timing.phase('parse'):
+            self._topics = self._parse_topics(
+                conf, self.root_node, self.filepath, self.topic_paths)
+        self.index.prune(self.topic_paths)
+        self.index.save()
+        self.index_full_text()
+
+    def is_current(self, conf):
+        """
+        Returns True if the topic files on disk are still the ones the store
+        was read from: the same paths, each with the mtime and size it had
+        when it was read. Only the store is walked; no topic file is read.
+        """
+        paths = self._gather_topics(conf, self.filepath)
+        if paths != self.topic_paths:
+            return False
+        return all(
+            self._stats.get(p) ==
+            topic_index.TopicIndex.stat_file(self.filepath, p)
+            for p in paths)
+
+    def reload(self, conf):
+        """
+        Read the store again from scratch. Topic files that did not change
+        are still taken from the index.
+        """
+        self._reset()
+        self.initialize(conf)
+
+    def _reset(self):
+        self.root_node = {}
+        self.root_node[constants.PARENT_KEY] = {}
+        self.topic_paths = []
+        self._topics = []
+        self._stats = {}
 
     def _create_selective_list(self, conf, name):
         if name not in conf:
             return []
         if constants.CONF_TOPIC_KEY not in conf[name]:
             return []
-        return conf[name][constants.CONF_TOPIC_KEY]
+        selected = conf[name][constants.CONF_TOPIC_KEY]
+        return [
+            k.strip() for k in selected.split(constants.CONF_LIST_DIVIDE_CHAR)
+            if k.strip()]
+
+    def _is_selected(self, conf, path):
+        """
+        Returns True if the topic at path (relative to the store root) is
+        wanted, which is always the case when no topics were selected.
+        """
+        if not self._selected_topics:
+            return True
+        key = constants.KEY_DIVIDE_CHAR.join(
+            tk.TopicKey.parse_topic_path(conf, path))
+        return key in self._selected_topics
 
     def update(self):
         pass
 
-    def _gather_topics(self, conf, mainpath, filepath):
+    def is_available(self):
+        """
+        Returns False if the files of the store are not there yet.
+        """
+        return True
+
+    def find_topic_path(self, conf, key):
+        """
+        Returns the path of the topic file with the given key if it exists
+        and is selected, or None. Only the file itself is looked at.
+        """
+        parts = key.split(constants.KEY_DIVIDE_CHAR)
+        if not self.filepath or any(
+                p in (constants.EMPTY, '.', '..') or
+                p in constants.IGNORED_DIRS for p in parts):
+            return None
+        for ext in constants.KNOWN_EXT:
+            path = key + ext
+            if (
+                    self._is_selected(conf, path) and
+                    os.path.isfile(os.path.join(self.filepath, path))):
+                return path
+        return None
+
+    def _gather_topics(self, conf, mainpath):
         """
-        Given paths locate files with known extensions and return as list.
+        Given the root of the topic store locate files with known extensions
+        and return them as a list of paths relative to mainpath.
+        """
+        if not conf or not mainpath:
+            return []
+        return list(self._walk_topics(conf, mainpath))
+
+    def _walk_topics(self, conf, mainpath):
+        """
+        Walk the topic store rooted at mainpath and yield the relative path
+        of every selected topic file.
+
+        Directories are walked in a single pass with os.scandir so the type
+        of every entry comes from the directory listing instead of a stat.
+        Directories in constants.IGNORED_DIRS are not entered. Entries are
+        visited in sorted order so the output is stable between runs.
+        """
+        ext = tuple(constants.KNOWN_EXT)
+        pending = [constants.EMPTY]
+        while pending:
+            relpath = pending.pop()
+            try:
+                with os.scandir(os.path.join(mainpath, relpath)) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+            subdirs = []
+            for entry in entries:
+                if entry.is_dir():
+                    if entry.name not in constants.IGNORED_DIRS:
+                        subdirs.append(
+                            relpath + entry.name + constants.KEY_DIVIDE_CHAR)
+                elif entry.name.lower().endswith(ext):
+                    path = relpath + entry.name
+                    if self._is_selected(conf, path):
+                        yield path
+            pending.extend(reversed(subdirs))
 
-        This method is recursive and will search subdirectories.
+    def _reindex_paths(self, conf, changed, removed):
+        """
+        Bring the store up to date with a known set of file changes instead
+        of walking and parsing the whole store again.
 
-        On initial call mainpath and filepath will likely be the same. The 
-        mainpath will be the root of the topic store, and the filepath will
-        hold the current subdirectory being searched.
+        changed: paths of topics that were added or modified
+        removed: paths of topics that no longer exist
 
-        All files will have their paths returned relative to mainpath (this
-        means that mainpath shouldn't be in the return).
+        Paths that are not topics or not selected are ignored.
         """
-        found_topics = []
-        if not conf or not mainpath or not filepath:
-            return found_topics
-        for f in os.listdir(filepath):
-            full_path = os.path.join(filepath, f)
-            if (
-                    not os.path.isdir(full_path) and 
-                    f.lower().endswith(tuple(constants.KNOWN_EXT))):
-                found_topics.append(full_path)
-            if os.path.isdir(full_path):
-                found_topics.extend(self._gather_topics(
-                    conf, mainpath, full_path))
-        found_topics = [
-            p.replace(mainpath, constants.EMPTY) for p in found_topics]
-        return found_topics
-
-    def _parse_topics(self, conf, root_node, rootpath, topic_paths):
+        ext = tuple(constants.KNOWN_EXT)
+        changed = set(
+            p for p in changed
+            if p.lower().endswith(ext) and self._is_selected(conf, p))
+        removed = set(p for p in removed if p not in changed)
+        for t in [t for t in self._topics if t.path in changed | removed]:
+            topic.Topic.unmap_topic_path_from_root_node(
+                conf, self.root_node, t.path, t)
+            self._topics.remove(t)
+        for p in removed:
+            self.index.remove(p)
+        for p in changed:
+            self.index.remove(p)
+        paths = sorted(changed, key=TopicStore.walk_order)
+        self._topics.extend(self._parse_topics(
+            conf, self.root_node, self.filepath, paths))
+        self._topics.sort(key=lambda t: TopicStore.walk_order(t.path))
+        self._topics_changed()
+        topic_paths = (set(self.topic_paths) - removed) | changed
+        self.topic_paths = sorted(topic_paths, key=TopicStore.walk_order)
+
+    @staticmethod
+    def walk_order(path):
+        """
+        Sort key putting paths in the order _walk_topics yields them: files
+        before the subdirectories of the same directory, both sorted by name.
+        """
+        parts = path.split(constants.KEY_DIVIDE_CHAR)
+        return [(1, p) for p in parts[:-1]] + [(0, parts[-1])]
+
+    def _parse_topics(
+            self, conf, root_node, rootpath, topic_paths, verify=True):
         """
         Produce all topic objects given a list of paths and store in graph
         structure whose root is represented by root_node.
@@ -98,19 +278,77 @@ class TopicStore(object):
         topic_paths: is a list of topic_paths starting from rootpath. this path
         is used for topic 'keying'
 
+        Unless lazy_topics is turned off in the configuration only the topic
+        headers are read here; bodies are read when first displayed.
+
+        verify: check the files against the index before trusting it; when
+        False every indexed topic is taken from the index as is
+
+        Topics missing from the index are read on a pool of threads when there
+        are enough of them, but the graph is always built in the order of
+        topic_paths.
+
         returns: a list of all topic objects created during this process
         """
-        topics = []
+        lookups = []
         for p in topic_paths:
+            stat = None
+            header = None if verify else self.index.header(p)
+            if header is None:
+                stat = topic_index.TopicIndex.stat_file(rootpath, p)
+                header = self.index.lookup(p, stat)
+                self._stats[p] = stat
+            lookups.append((p, stat, header))
+        parsed = self._read_topics(
+            conf, root_node, rootpath,
+            [p for p, _stat, header in lookups if header is None])
+
+        topics = []
+        for p, stat, header in lookups:
+            indexed = header is not None
+            text = None
+            if not indexed and p in parsed:
+                header, text = parsed[p]
             try:
-                t = topic.Topic(conf, root_node, rootpath, p)
+                t = topic.Topic(
+                    conf, root_node, rootpath, p, header=header,
+                    lazy=self._lazy, text=text)
                 topics.append(t)
             except exc.TopicError:
                 continue
-        if self._selected_topics:
-            topics = [t for t in topics if str(t.key) in self._selected_topics]
+            if not indexed:
+                self.index.record(p, stat, t.meta, t.summary)
         return topics
 
+    def _read_topics(self, conf, root_node, rootpath, topic_paths):
+        """
+        Read the given topics concurrently and return a dict of
+        path -> ((meta, summary), text) for every topic that could be read.
+
+        Nothing is read when there are too few topics to be worth it; topics
+        left out are read by the Topic itself, which also raises the errors.
+        """
+        if (
+                self._workers <= 1 or
+                len(topic_paths) < constants.PARALLEL_PARSE_MIN):
+            return {}
+
+        def read(path):
+            try:
+                if self._lazy:
+                    return topic.Topic.parse_topic_header(
+                        conf, root_node, rootpath, path), None
+                meta, summary, text = topic.Topic.parse_topic_contents(
+                    conf, root_node, rootpath, path)
+                return (meta, summary), text
+            except Exception:
+                return None
+
+        with concurrent.futures.ThreadPoolExecutor(self._workers) as pool:
+            results = list(pool.map(read, topic_paths))
+        return dict(
+            (p, r) for p, r in zip(topic_paths, results) if r is not None)
+
     def _parents(self):
         """
         Return a list of all parents for this store.
@@ -123,21 +361,113 @@ class TopicStore(object):
     def topic_count(self):
         return len(self._topics)
 
-    def has_topic(self, topic):
+    def _map_keys(self):
+        self._key_map = {}
         for t in self._topics:
-            if t.is_topic(topic):
-                return True
-        return False
+            self._key_map.setdefault(str(t.key), t)
+
+    @property
+    def key_map(self):
+        if self._key_map is None:
+            self._map_keys()
+        return self._key_map
+
+    def has_topic(self, topic):
+        return topic in self.key_map
 
     def has_parent(self, parent):
         return parent in self._parents()
 
-    def meta_search(self, meta_string):
-        out = []
-        for t in self._topics:
-            match = t.meta_match(meta_string)
-            if match > 0:
-                out.append((match, self.name, t))
+    @property
+    def search_index(self):
+        if self._search_index is None:
+            self._search_index = search_index.SearchIndex(self._topics)
+        return self._search_index
+
+    def version_stamp(self):
+        """
+        Returns a string that changes whenever the topics of this store do.
+        """
+        return '%s %s' % (
+            self.index.digest(),
+            constants.CONF_LIST_DIVIDE_CHAR.join(self._selected_topics))
+
+    @property
+    def query_cache(self):
+        if self._query_cache is None:
+            self._query_cache = query_cache.QueryCache(
+                self.name, self.version_stamp(), self._query_cache_size)
+            self._query_cache.load()
+        return self._query_cache
+
+    def index_full_text(self, force=False):
+        """
+        Bring the full text index up to date with the topics if full_text is
+        turned on, or always if force is True. Only topics whose files
+        changed since they were indexed are read.
+        """
+        if not (force or self._full_text):
+            return
+        ft_index = self.fulltext_index
+        digest = self.index.digest()
+        if ft_index.is_current(digest):
+            return
+        if not ft_index.loaded:
+            ft_index.load()
+        stats = dict(
+            (p, (e.get('mtime'), e.get('size')))
+            for p, e in self.index.entries.items())
+        ft_index.update(self._topics, stats)
+        ft_index.save(digest)
+
+    def full_text_search(self, query, limit=None):
+        """
+        Returns (score, store name, topic) for the limit topics whose text
+        best matches query, best first, building the full text index first
+        if needed.
+        """
+        self.index_full_text(force=True)
+        if not self.fulltext_index.loaded:
+            self.fulltext_index.load()
+        topics = dict((t.path, t) for t in self._topics)
+        return [
+            (score, self.name, topics[path])
+            for score, path in self.fulltext_index.search(query, limit)
+            if path in topics]
+
+    def search_parent(self, meta_string):
+        """
+        Returns the longest parent in the graph that meta_string starts
+        with, followed by a divider, or None.
+        """
+        parts = meta_string.split(constants.KEY_DIVIDE_CHAR)
+        for i in range(len(parts) - 1, 0, -1):
+            parent = constants.KEY_DIVIDE_CHAR.join(parts[:i])
+            if self.has_parent(parent):
+                return parent
+        return None
+
+    def meta_search(self, meta_string, min_score=0, parent=None):
+        """
+        Returns (score, store name, topic) for every topic matching
+        meta_string, only looking below parent if it is given. Topics that
+        cannot score above min_score are skipped without being scored.
+
+        Results are kept in the query cache; a repeated search is answered
+        from it without scoring anything.
+        """
+        cache = self.query_cache
+        cached = cache.get(meta_string, min_score, parent)
+        if cached is not None and all(k in self.key_map for s, k in cached):
+            return [(s, self.name, self.key_map[k]) for s, k in cached]
+        out = [
+            (match, self.name, t)
+            for match, t in self.search_index.search(
+                meta_string, min_score, parent)]
+        cache.put(
+            meta_string, min_score, [(m, str(t.key)) for m, n, t in out],
+            parent)
+        cache.save()
         return out
 
     def get_topic(self, path):
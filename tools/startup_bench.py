@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# Copyright (c) 2016 Justin L. Hammond
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Report how long it takes to import an eh entry point.
+
+Runs `python -X importtime -c "import <module>"` a few times in fresh
+interpreters and prints the median total import time, the slowest imports and
+whether any of the heavy optional dependencies were loaded.
+
+Usage:
+
+    python tools/startup_bench.py [--module eh.cli] [--runs 5] [--top 15]
+                                  [--strict]
+
+With --strict the exit code is 1 if a heavy dependency was imported.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ['git', 'mdv', 'yaml', 'fuzzywuzzy', 'prettytable']
+
+
+def import_times(module):
+    """
+    Returns {module name: (self us, cumulative us)} for one fresh import of
+    module.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        times[name] = (int(parts[0]), int(parts[1]))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--module', default='eh.cli')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--strict', action='store_true')
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    totals = [r.get(args.module, (0, 0))[1] for r in runs]
+    last = runs[-1]
+
+    print("Import of %s over %d runs" % (args.module, args.runs))
+    print("  median: %.1f ms" % (statistics.median(totals) / 1000.0))
+    print("  min:    %.1f ms" % (min(totals) / 1000.0))
+    print("")
+    print("Slowest imports (cumulative, last run):")
+    slowest = sorted(last.items(), key=lambda x: x[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[:args.top]:
+        print("  %8.1f ms  %s" % (cumulative_us / 1000.0, name))
+    print("")
+    loaded = [m for m in HEAVY_MODULES if m in last]
+    print("Heavy dependencies imported: %s" % (", ".join(loaded) or "none"))
+    if args.strict and loaded:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())